@@ -1,17 +1,17 @@
 from typing import List
+from aws_quota.utils import get_client, paginate
+from aws_quota.inventory import INVENTORY
 from .quota_check import QuotaCheck, QuotaScope
 
 import boto3
-import cachetools
 
 
-@cachetools.cached(cache=cachetools.TTLCache(1, 60))
+@INVENTORY.collection
 def get_all_running_ec2_instances(session: boto3.Session):
     instances = []
-    paginator = session.client('ec2').get_paginator('describe_instances')
     filters = [{'Name': 'instance-state-name', 'Values': ['running']}]
 
-    for page in paginator.paginate(Filters=filters):
+    for page in paginate(session, 'ec2', 'describe_instances', {'Filters': filters}):
         for res in page['Reservations']:
             instances += res['Instances']
 
@@ -32,9 +32,9 @@ def count_vcpus_for_instance_types(instances, instance_types):
     return vcpu_count
 
 
-@cachetools.cached(cache=cachetools.TTLCache(1, 60))
+@INVENTORY.collection
 def get_all_spot_requests(session: boto3.Session):
-    return session.client('ec2').describe_spot_instance_requests()[
+    return get_client(session, 'ec2').describe_spot_instance_requests()[
         'SpotInstanceRequests']
 
 
@@ -203,7 +203,7 @@ class ElasticIpCountCheck(QuotaCheck):
 
     @property
     def current(self):
-        return len(self.boto_session.client('ec2').describe_addresses()['Addresses'])
+        return len(get_client(self.boto_session, 'ec2').describe_addresses()['Addresses'])
 
 
 class TransitGatewayCountCheck(QuotaCheck):
@@ -227,7 +227,7 @@ class VpnConnectionCountCheck(QuotaCheck):
 
     @property
     def current(self):
-        return len(self.boto_session.client('ec2').describe_vpn_connections()['VpnConnections'])
+        return len(get_client(self.boto_session, 'ec2').describe_vpn_connections()['VpnConnections'])
 
 class LaunchTemplatesCount(QuotaCheck):
     key = "launch_templates_count"
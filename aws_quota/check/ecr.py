@@ -1,12 +1,14 @@
 from typing import List
+from aws_quota.exceptions import InstanceWithIdentifierNotFound
+from aws_quota.inventory import INVENTORY
 from .quota_check import InstanceQuotaCheck, QuotaScope
-from aws_quota.utils import get_paginated_results
+from aws_quota.utils import count_paginated_results, get_paginated_results, paginate
 
 import boto3
-import cachetools
+import botocore.exceptions
 
 
-@cachetools.cached(cache=cachetools.TTLCache(maxsize=1, ttl=60))
+@INVENTORY.collection
 def get_all_repositories(session: boto3.Session) -> List[str]:
     services = ['ecr']
     # ECR is available in all regions, but ecr-public is only available in us-east-1
@@ -14,17 +16,29 @@ def get_all_repositories(session: boto3.Session) -> List[str]:
         services.append('ecr-public')
 
     return [
-        repository['repositoryArn'] 
+        repository['repositoryArn']
         for service in services
         for repository in get_paginated_results(session, service, 'describe_repositories', 'repositories')
     ]
 
-@cachetools.cached(cache=cachetools.TTLCache(10000, 60))    # 10k = default number of max registries per account
-def get_repository_images(session: boto3.Session, repository_arn: str) -> List[str]:
+def count_repository_images(session: boto3.Session, repository_arn: str) -> int:
+    """Number of images in a repository, streamed page by page instead of keeping the image details
+
+    ListImages returns one entry per tag, so tagged images are counted by digest.
+    ecr-public doesn't support ListImages, its image details are counted without being kept.
+    """
     arn_parts = repository_arn.split(':')
     service = arn_parts[2]
     repository_name = arn_parts[5].removeprefix("repository/")
-    return get_paginated_results(session, service, "describe_images", "imageDetails", {'repositoryName': repository_name})
+
+    if service == 'ecr-public':
+        return count_paginated_results(session, service, 'describe_images', 'imageDetails', {'repositoryName': repository_name})
+
+    digests = set()
+    for page in paginate(session, service, 'list_images', {'repositoryName': repository_name}):
+        digests.update(image['imageDigest'] for image in page['imageIds'])
+
+    return len(digests)
 
 class ImagesPerRepository(InstanceQuotaCheck):
     key = "ecr_images_per_repository"
@@ -40,4 +54,10 @@ class ImagesPerRepository(InstanceQuotaCheck):
 
     @property
     def current(self):
-        return len(get_repository_images(self.boto_session, self.instance_id))
+        # every repository is its own check, so the exporter counts them concurrently
+        try:
+            return count_repository_images(self.boto_session, self.instance_id)
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] == 'RepositoryNotFoundException':
+                raise InstanceWithIdentifierNotFound(self) from e
+            raise
@@ -1,21 +1,21 @@
 import typing
 import boto3
-import cachetools
 from aws_quota.check.ec2 import get_all_running_ec2_instances
 
 from aws_quota.utils import get_paginated_results
+from aws_quota.inventory import INVENTORY
 from .quota_check import InstanceQuotaCheck, QuotaCheck, QuotaScope
 
-@cachetools.cached(cache=cachetools.TTLCache(1, 60))
+@INVENTORY.collection
 def get_all_eks_clusters(session: boto3.Session) -> typing.List[str]:
     return get_paginated_results(session, "eks", "list_clusters", "clusters")
 
 
-@cachetools.cached(cache=cachetools.TTLCache(100, 60))
+@INVENTORY.collection
 def get_node_groups(session: boto3.Session, cluster_name) -> typing.List[str]:
     return get_paginated_results(session, "eks", "list_nodegroups", "nodegroups", {'clusterName': cluster_name})
 
-@cachetools.cached(cache=cachetools.TTLCache(100, 60))
+@INVENTORY.collection
 def get_eks_pod_identities(session: boto3.Session, cluster_name) -> typing.List[str]:
     return get_paginated_results(session, "eks", "list_pod_identity_associations", "associations", {'clusterName': cluster_name})
 
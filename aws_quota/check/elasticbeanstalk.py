@@ -1,3 +1,4 @@
+from aws_quota.utils import get_client
 from .quota_check import QuotaCheck, QuotaScope
 
 
@@ -10,7 +11,7 @@ class ApplicationCountCheck(QuotaCheck):
 
     @property
     def current(self):
-        return len(self.boto_session.client('elasticbeanstalk').describe_applications()['Applications'])
+        return len(get_client(self.boto_session, 'elasticbeanstalk').describe_applications()['Applications'])
 
 
 class EnvironmentCountCheck(QuotaCheck):
@@ -22,4 +23,4 @@ class EnvironmentCountCheck(QuotaCheck):
 
     @property
     def current(self):
-        return len(self.boto_session.client('elasticbeanstalk').describe_environments()['Environments'])
+        return len(get_client(self.boto_session, 'elasticbeanstalk').describe_environments()['Environments'])
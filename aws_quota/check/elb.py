@@ -1,12 +1,12 @@
-import cachetools
-from aws_quota.exceptions import InstanceWithIdentifierNotFound
+import collections
 import typing
 import boto3
 
-from aws_quota.utils import get_paginated_results
+from aws_quota.utils import count_paginated_results, get_paginated_results, get_client, map_concurrently, paginate
+from aws_quota.inventory import INVENTORY
 from .quota_check import QuotaCheck, InstanceQuotaCheck, QuotaScope
 
-@cachetools.cached(cache=cachetools.TTLCache(1, 60))
+@INVENTORY.collection
 def get_elbv2s(session: boto3.Session):
     return get_paginated_results(session, 'elbv2', 'describe_load_balancers', 'LoadBalancers')
 
@@ -16,10 +16,45 @@ def get_albs(session: boto3.Session):
 def get_nlbs(session: boto3.Session):
     return list(filter(lambda lb: lb['Type'] == 'network', get_elbv2s(session)))
 
-@cachetools.cached(cache=cachetools.TTLCache(1, 60))
+@INVENTORY.collection
 def get_classic_elbs(session: boto3.Session):
     return get_paginated_results(session, 'elb', 'describe_load_balancers', 'LoadBalancerDescriptions')
 
+@INVENTORY.collection
+def get_listener_counts(session: boto3.Session) -> typing.Dict[str, int]:
+    """Number of listeners of every ALB and NLB keyed by ARN, the load balancers are fetched concurrently"""
+    client = get_client(session, 'elbv2')
+
+    def count_listeners(lb_arn: str) -> typing.Optional[int]:
+        try:
+            return count_paginated_results(session, 'elbv2', 'describe_listeners', 'Listeners', {'LoadBalancerArn': lb_arn})
+        except client.exceptions.LoadBalancerNotFoundException:
+            # deleted since it was listed
+            return None
+
+    lb_arns = [lb['LoadBalancerArn'] for lb in get_elbv2s(session) if lb['Type'] in ('application', 'network')]
+    return {
+        lb_arn: count
+        for lb_arn, count in zip(lb_arns, map_concurrently(count_listeners, lb_arns))
+        if count is not None
+    }
+
+class TargetGroups(typing.NamedTuple):
+    count: int
+    per_load_balancer: typing.Dict[str, int]
+
+@INVENTORY.collection
+def get_target_groups(session: boto3.Session) -> TargetGroups:
+    """Target groups counted per load balancer from one unfiltered sweep instead of one listing per load balancer"""
+    count = 0
+    per_load_balancer = collections.Counter()
+    for page in paginate(session, 'elbv2', 'describe_target_groups'):
+        for target_group in page['TargetGroups']:
+            count += 1
+            per_load_balancer.update(target_group.get('LoadBalancerArns', []))
+
+    return TargetGroups(count, dict(per_load_balancer))
+
 
 class ClassicLoadBalancerCountCheck(QuotaCheck):
     key = "elb_clb_count"
@@ -44,16 +79,9 @@ class ListenerPerClassicLoadBalancerCountCheck(InstanceQuotaCheck):
     def get_all_identifiers(session: boto3.Session) -> typing.List[str]:
         return [ lb['LoadBalancerName'] for lb in get_classic_elbs(session)]
 
-    @property
-    def current(self):
-        try:
-            return len(
-                self.boto_session.client('elb').describe_load_balancers(
-                    LoadBalancerNames=[self.instance_id]
-                )['LoadBalancerDescriptions'][0]['ListenerDescriptions']
-            )
-        except self.boto_session.client('elb').exceptions.AccessPointNotFoundException as e:
-            raise InstanceWithIdentifierNotFound(self) from e
+    @classmethod
+    def batch_current(cls, session: boto3.Session) -> typing.Dict[str, int]:
+        return {lb['LoadBalancerName']: len(lb['ListenerDescriptions']) for lb in get_classic_elbs(session)}
 
 
 class NetworkLoadBalancerCountCheck(QuotaCheck):
@@ -79,12 +107,9 @@ class ListenerPerNetworkLoadBalancerCountCheck(InstanceQuotaCheck):
     def get_all_identifiers(session: boto3.Session) -> typing.List[str]:
         return [alb['LoadBalancerArn'] for alb in get_nlbs(session)]
 
-    @property
-    def current(self):
-        try:
-            return self.count_paginated_results('elbv2', 'describe_listeners', 'Listeners', {'LoadBalancerArn': self.instance_id})
-        except self.boto_session.client('elbv2').exceptions.LoadBalancerNotFoundException as e:
-            raise InstanceWithIdentifierNotFound(self) from e
+    @classmethod
+    def batch_current(cls, session: boto3.Session) -> typing.Dict[str, int]:
+        return get_listener_counts(session)
 
 
 class ApplicationLoadBalancerCountCheck(QuotaCheck):
@@ -110,12 +135,9 @@ class ListenerPerApplicationLoadBalancerCountCheck(InstanceQuotaCheck):
     def get_all_identifiers(session: boto3.Session) -> typing.List[str]:
         return [alb['LoadBalancerArn'] for alb in get_albs(session)]
 
-    @property
-    def current(self) -> int:
-        try:
-            return self.count_paginated_results('elbv2', 'describe_listeners', 'Listeners', {'LoadBalancerArn': self.instance_id})
-        except self.boto_session.client('elbv2').exceptions.LoadBalancerNotFoundException as e:
-            raise InstanceWithIdentifierNotFound(self) from e
+    @classmethod
+    def batch_current(cls, session: boto3.Session) -> typing.Dict[str, int]:
+        return get_listener_counts(session)
 
 
 class TargetGroupCountCheck(QuotaCheck):
@@ -127,7 +149,7 @@ class TargetGroupCountCheck(QuotaCheck):
 
     @property
     def current(self):
-        return self.count_paginated_results('elbv2', 'describe_target_groups', 'TargetGroups')
+        return get_target_groups(self.boto_session).count
 
 
 class TargetGroupsPerApplicationLoadBalancerCountCheck(InstanceQuotaCheck):
@@ -141,9 +163,7 @@ class TargetGroupsPerApplicationLoadBalancerCountCheck(InstanceQuotaCheck):
     def get_all_identifiers(session: boto3.Session) -> typing.List[str]:
         return [alb['LoadBalancerArn'] for alb in get_albs(session)]
 
-    @property
-    def current(self) -> int:
-        try:
-            return self.count_paginated_results('elbv2', 'describe_target_groups', 'TargetGroups', {'LoadBalancerArn': self.instance_id})
-        except self.boto_session.client('elbv2').exceptions.LoadBalancerNotFoundException as e:
-            raise InstanceWithIdentifierNotFound(self) from e
+    @classmethod
+    def batch_current(cls, session: boto3.Session) -> typing.Dict[str, int]:
+        per_load_balancer = get_target_groups(session).per_load_balancer
+        return {alb['LoadBalancerArn']: per_load_balancer.get(alb['LoadBalancerArn'], 0) for alb in get_albs(session)}
@@ -1,13 +1,35 @@
-import cachetools
-from aws_quota.exceptions import InstanceWithIdentifierNotFound
 import typing
 
 import boto3
+from aws_quota.utils import get_client, paginate
+from aws_quota.inventory import INVENTORY
 from .quota_check import InstanceQuotaCheck, QuotaCheck, QuotaScope
 
-@cachetools.cached(cache=cachetools.TTLCache(1, 60))
+@INVENTORY.collection
 def iam_account_summary(session: boto3.Session):
-    return session.client('iam').get_account_summary()
+    return get_client(session, 'iam').get_account_summary()
+
+
+@INVENTORY.collection
+def iam_attached_policy_counts(session: boto3.Session) -> typing.Dict[str, typing.Dict[str, int]]:
+    """Number of attached managed policies of every user, group and role keyed by principal type and name
+
+    One paginated GetAccountAuthorizationDetails sweep replaces a list call per principal,
+    only the counts are kept instead of the policy documents.
+    """
+    principals = {'User': {}, 'Group': {}, 'Role': {}}
+    details = (
+        ('User', 'UserDetailList', 'UserName'),
+        ('Group', 'GroupDetailList', 'GroupName'),
+        ('Role', 'RoleDetailList', 'RoleName'),
+    )
+
+    for page in paginate(session, 'iam', 'get_account_authorization_details', {'Filter': list(principals)}):
+        for principal_type, list_key, name_key in details:
+            for principal in page.get(list_key, []):
+                principals[principal_type][principal[name_key]] = len(principal.get('AttachedManagedPolicies', []))
+
+    return principals
 
 class GroupCountCheck(QuotaCheck):
     key = "iam_group_count"
@@ -89,63 +111,57 @@ class AttachedPolicyPerUserCheck(InstanceQuotaCheck):
     description = "Attached IAM policies per user"
     instance_id = "User Name"
     service_code = "iam"
+    global_service = True
 
     @staticmethod
     def get_all_identifiers(session: boto3.Session) -> typing.List[str]:
-        return [user['UserName'] for user in session.client('iam').list_users()['Users']]
+        return list(iam_attached_policy_counts(session)['User'])
 
     @property
     def maximum(self):
         return iam_account_summary(self.boto_session)['SummaryMap']['AttachedPoliciesPerUserQuota']
 
-    @property
-    def current(self):
-        try:
-            return len(self.boto_session.client('iam').list_user_policies(UserName=self.instance_id)['PolicyNames'])
-        except self.boto_session.client('iam').exceptions.NoSuchEntityException as e:
-            raise InstanceWithIdentifierNotFound(self) from e
+    @classmethod
+    def batch_current(cls, session: boto3.Session) -> typing.Dict[str, int]:
+        return iam_attached_policy_counts(session)['User']
 
 class AttachedPolicyPerGroupCheck(InstanceQuotaCheck):
     key = "iam_attached_policy_per_group"
     description = "Attached IAM policies per group"
     instance_id = "Group Name"
     service_code = "iam"
+    global_service = True
 
     @staticmethod
     def get_all_identifiers(session: boto3.Session) -> typing.List[str]:
-        return [user['GroupName'] for user in session.client('iam').list_groups()['Groups']]
+        return list(iam_attached_policy_counts(session)['Group'])
 
     @property
     def maximum(self):
         return iam_account_summary(self.boto_session)['SummaryMap']['AttachedPoliciesPerGroupQuota']
 
-    @property
-    def current(self):
-        try:
-            return len(self.boto_session.client('iam').list_group_policies(GroupName=self.instance_id)['PolicyNames'])
-        except self.boto_session.client('iam').exceptions.NoSuchEntityException as e:
-            raise InstanceWithIdentifierNotFound(self) from e
+    @classmethod
+    def batch_current(cls, session: boto3.Session) -> typing.Dict[str, int]:
+        return iam_attached_policy_counts(session)['Group']
 
 class AttachedPolicyPerRoleCheck(InstanceQuotaCheck):
     key = "iam_attached_policy_per_role"
     description = "Attached IAM policies per role"
     instance_id = "Role Name"
     service_code = "iam"
+    global_service = True
 
     @staticmethod
     def get_all_identifiers(session: boto3.Session) -> typing.List[str]:
-        return [user['RoleName'] for user in session.client('iam').list_roles()['Roles']]
+        return list(iam_attached_policy_counts(session)['Role'])
 
     @property
     def maximum(self):
         return iam_account_summary(self.boto_session)['SummaryMap']['AttachedPoliciesPerRoleQuota']
 
-    @property
-    def current(self):
-        try:
-            return len(self.boto_session.client('iam').list_role_policies(RoleName=self.instance_id)['PolicyNames'])
-        except self.boto_session.client('iam').exceptions.NoSuchEntityException as e:
-            raise InstanceWithIdentifierNotFound(self) from e
+    @classmethod
+    def batch_current(cls, session: boto3.Session) -> typing.Dict[str, int]:
+        return iam_attached_policy_counts(session)['Role']
 
 class RoleCountCheck(QuotaCheck):
     key = "iam_role_count"
@@ -1,28 +1,90 @@
 import cachetools
+import collections
+import logging
+import threading
+import time
 from cachetools.keys import hashkey
-from aws_quota.utils import get_account_id, get_paginated_results
+from aws_quota.exceptions import InstanceWithIdentifierNotFound
+from aws_quota.utils import count_paginated_results, get_account_id, get_client, retry_config, short_exception
 import enum
+import functools
 import typing
 
 import boto3
-from botocore.config import Config
 
-# create custom hash key that ignores boto client
-def get_service_quota_cache_key(sq_client, service_code, quota_code):
-    return hashkey(service_code, quota_code)
+# create custom hash key that replaces boto client by its account and region, like ServiceQuotaTables does
+def get_service_quota_cache_key(sq_client, account, service_code, quota_code):
+    return hashkey(account, sq_client.meta.region_name, service_code, quota_code)
 
-# create custom hash key that ignores boto client
-def get_default_service_quota_cache_key(sq_client, service_code, quota_code):
-    return hashkey("default", service_code, quota_code)
+# create custom hash key that replaces boto client by its account and region, like ServiceQuotaTables does
+def get_default_service_quota_cache_key(sq_client, account, service_code, quota_code):
+    return hashkey("default", account, sq_client.meta.region_name, service_code, quota_code)
 
-@cachetools.cached(cache=cachetools.TTLCache(1000, 3600), key=get_service_quota_cache_key)
-def get_service_quota(sq_client: boto3.client, service_code, quota_code):
+@cachetools.cached(cache=cachetools.TTLCache(10000, 3600), key=get_service_quota_cache_key, lock=threading.Lock())
+def get_service_quota(sq_client: boto3.client, account, service_code, quota_code):
     return sq_client.get_service_quota(ServiceCode=service_code, QuotaCode=quota_code)['Quota']
 
-@cachetools.cached(cache=cachetools.TTLCache(1000, 3600), key=get_default_service_quota_cache_key)
-def get_default_service_quota(sq_client: boto3.client, service_code, quota_code):
+@cachetools.cached(cache=cachetools.TTLCache(10000, 3600), key=get_default_service_quota_cache_key, lock=threading.Lock())
+def get_default_service_quota(sq_client: boto3.client, account, service_code, quota_code):
     return sq_client.get_aws_default_service_quota(ServiceCode=service_code, QuotaCode=quota_code)['Quota']
 
+logger = logging.getLogger(__name__)
+
+
+class ServiceQuotaTables:
+    """Quota values per (account, region, service code)
+
+    Each table is loaded in bulk with ListAWSDefaultServiceQuotas and ListServiceQuotas,
+    applied values take precedence over defaults. Tables are reloaded once they are older than refresh_interval.
+    If the first load fails, e.g. because the role isn't allowed to list quotas, an empty table is kept
+    until the next refresh and checks look up their quotas individually.
+    """
+
+    def __init__(self, refresh_interval: int = 3600) -> None:
+        self.refresh_interval = refresh_interval
+        self._tables = {}
+        self._locks = collections.defaultdict(threading.Lock)
+        self._lock = threading.Lock()
+
+    def get(self, sq_client: boto3.client, account: str, service_code: str) -> typing.Dict[str, float]:
+        key = (account, sq_client.meta.region_name, service_code)
+
+        with self._lock:
+            lock = self._locks[key]
+
+        # one lock per table, concurrent checks of the same service wait for a single load
+        with lock:
+            loaded_at, table = self._tables.get(key, (None, None))
+            if loaded_at is not None and time.monotonic() - loaded_at < self.refresh_interval:
+                return table
+
+            try:
+                table = self.load(sq_client, service_code)
+            except Exception as e:
+                if table is None:
+                    table = {}
+                    logger.warning('loading service quotas of %s failed, looking them up individually (%s)', key, short_exception(e))
+                else:
+                    logger.warning('reloading service quotas of %s failed, keeping previous values (%s)', key, short_exception(e))
+
+            self._tables[key] = (time.monotonic(), table)
+            return table
+
+    @staticmethod
+    def load(sq_client: boto3.client, service_code: str) -> typing.Dict[str, float]:
+        table = {}
+        for method in ('list_aws_default_service_quotas', 'list_service_quotas'):
+            paginator = sq_client.get_paginator(method)
+            for page in paginator.paginate(ServiceCode=service_code, PaginationConfig={'PageSize': 100}):
+                for quota in page['Quotas']:
+                    table[quota['QuotaCode']] = quota['Value']
+
+        return table
+
+
+SERVICE_QUOTA_TABLES = ServiceQuotaTables()
+
+
 class QuotaScope(enum.Enum):
     ACCOUNT = 0
     REGION = 1
@@ -36,6 +98,8 @@ class QuotaCheck:
     quota_code: str = None
     quota_limit_override: int = None
     quota_region_override: str = None
+    # instance checks of global services, e.g. IAM or Route53, see the same resources in every region
+    global_service: bool = False
     warning_threshold: float = None
     error_threshold: float = None
     # retries are needed to handle rate limiting
@@ -46,27 +110,48 @@ class QuotaCheck:
         super().__init__()
 
         self.boto_session = boto_session
-        client_config = Config(
-            retries = {
-                'max_attempts': self.retry_attempts,
-                'mode': 'standard'
-            }
-        )
-        
+
         client_region=None
         if self.scope == QuotaScope.ACCOUNT and self.quota_region_override:
             client_region = self.quota_region_override
 
-        self.sq_client = boto_session.client('service-quotas', config=client_config, region_name=client_region)
+        self.sq_client = get_client(boto_session, 'service-quotas', region_name=client_region, config=retry_config(self.retry_attempts))
 
     def __str__(self) -> str:
         return f'{self.key}{self.label_values}'
 
-    def count_paginated_results(self, service: str, method: str, key: str, paginate_args: dict = {}) -> int:
-        return len(get_paginated_results(self.boto_session, service, method, key, paginate_args))
-
-    @property
-    def label_values(self):
+    @classmethod
+    def is_global(cls) -> bool:
+        """Global checks yield the same result in every region, so they only need to run in one of them"""
+        return cls.scope == QuotaScope.ACCOUNT or cls.global_service
+
+    @classmethod
+    def sessions_to_check(cls, sessions: typing.List[boto3.Session]) -> typing.List[boto3.Session]:
+        """Sessions to run this check in, global checks only run in the first region of each account"""
+        if not cls.is_global():
+            return sessions
+
+        first_sessions = {}
+        for session in sessions:
+            first_sessions.setdefault(get_account_id(session), session)
+
+        return list(first_sessions.values())
+
+    def count_paginated_results(self,
+                                service: str,
+                                method: str,
+                                key: str,
+                                paginate_args: dict = {},
+                                predicate: typing.Callable[[dict], bool] = None) -> int:
+        return count_paginated_results(self.boto_session, service, method, key, paginate_args, predicate)
+
+    @functools.cached_property
+    def labels(self) -> typing.Tuple[typing.Tuple[str, str], ...]:
+        """Label pairs sorted by label name, computed once on first use instead of on every access
+
+        Checks are created on the event loop, the first use happens on a worker thread, so looking up
+        the account doesn't block the exporter.
+        """
         label_values = {
             'quota': self.key,
             'account': get_account_id(self.boto_session),
@@ -84,17 +169,27 @@ class QuotaCheck:
             else:
                 label_values['aws_resource'] = self.instance_id
 
-        return label_values
+        return tuple(sorted((key, str(value)) for key, value in label_values.items()))
+
+    @property
+    def label_values(self) -> typing.Dict[str, str]:
+        return dict(self.labels)
 
     @property
     def maximum(self) -> int:
         if self.quota_limit_override is not None:
             return self.quota_limit_override
 
+        account = get_account_id(self.boto_session)
+        table = SERVICE_QUOTA_TABLES.get(self.sq_client, account, self.service_code)
+        if self.quota_code in table:
+            return int(table[self.quota_code])
+
+        # quotas that are missing from the listings are looked up individually
         try:
-            return int(get_service_quota(self.sq_client, self.service_code, self.quota_code)['Value'])
+            return int(get_service_quota(self.sq_client, account, self.service_code, self.quota_code)['Value'])
         except self.sq_client.exceptions.NoSuchResourceException:
-            return int(get_default_service_quota(self.sq_client, self.service_code, self.quota_code)['Value'])
+            return int(get_default_service_quota(self.sq_client, account, self.service_code, self.quota_code)['Value'])
 
     @property
     def current(self) -> int:
@@ -113,3 +208,27 @@ class InstanceQuotaCheck(QuotaCheck):
     @staticmethod
     def get_all_identifiers(session: boto3.Session) -> typing.List[str]:
         raise NotImplementedError
+
+    @classmethod
+    def batch_current(cls, session: boto3.Session) -> typing.Dict[str, int]:
+        """Current values of all instances of this check keyed by identifier, computed in one pass
+
+        Checks that can answer for all instances at once implement this instead of current.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def supports_batch_current(cls) -> bool:
+        return cls.batch_current.__func__ is not InstanceQuotaCheck.batch_current.__func__
+
+    @property
+    def current(self) -> int:
+        if not self.supports_batch_current():
+            raise NotImplementedError
+
+        # a KeyError raised by the batch itself is a bug, not a missing instance
+        currents = self.batch_current(self.boto_session)
+        try:
+            return currents[self.instance_id]
+        except KeyError:
+            raise InstanceWithIdentifierNotFound(self)
@@ -2,24 +2,41 @@ from aws_quota.exceptions import InstanceWithIdentifierNotFound
 import typing
 import boto3
 import cachetools
+import threading
+from cachetools.keys import hashkey
+from aws_quota.inventory import INVENTORY
+from aws_quota.utils import get_account_id, get_client, get_paginated_results
 from .quota_check import InstanceQuotaCheck, QuotaCheck, QuotaScope
 
 # Route53 has quite a low API rate limits, adding cache should reduce throttling rates a bit
 # https://docs.aws.amazon.com/Route53/latest/DeveloperGuide/DNSLimitations.html#limits-api-requests
 
-@cachetools.cached(cache=cachetools.TTLCache(maxsize=10, ttl=1200))
+# Route53 is global, so limits are cached per account instead of per session
+def get_route53_account_limits_cache_key(session: boto3.Session, limit_type: str):
+    return hashkey(get_account_id(session), limit_type)
+
+@cachetools.cached(cache=cachetools.TTLCache(maxsize=10000, ttl=1200), key=get_route53_account_limits_cache_key, lock=threading.Lock())
 def get_route53_account_limits(session: boto3.Session, limit_type: str):
-    return session.client("route53").get_account_limit(Type=limit_type)
+    return get_client(session, "route53").get_account_limit(Type=limit_type)
+
+
+# limits of hosted zones hardly ever change, so they are only fetched once a day per zone
+HOSTED_ZONE_LIMIT_TTL = 86400
 
 
-@cachetools.cached(cache=cachetools.TTLCache(maxsize=100, ttl=1200))
+@cachetools.cached(cache=cachetools.TTLCache(maxsize=10000, ttl=1200), lock=threading.Lock())
 def get_route53_hosted_zone_limits(session: boto3.Session, limit_type: str, hosted_zone_id: str):
-    return session.client("route53").get_hosted_zone_limit(Type=limit_type, HostedZoneId=hosted_zone_id)
+    return get_client(session, "route53").get_hosted_zone_limit(Type=limit_type, HostedZoneId=hosted_zone_id)
+
+
+@cachetools.cached(cache=cachetools.TTLCache(maxsize=10000, ttl=HOSTED_ZONE_LIMIT_TTL), lock=threading.Lock())
+def get_route53_hosted_zone_limit_value(session: boto3.Session, limit_type: str, hosted_zone_id: str):
+    return get_route53_hosted_zone_limits(session, limit_type, hosted_zone_id)["Limit"]["Value"]
 
 
-@cachetools.cached(cache=cachetools.TTLCache(maxsize=1, ttl=1200))
+@INVENTORY.collection
 def list_route53_hosted_zones(session: boto3.Session):
-    return session.client("route53").list_hosted_zones()["HostedZones"]
+    return get_paginated_results(session, "route53", "list_hosted_zones", "HostedZones")
 
 
 class HostedZoneCountCheck(QuotaCheck):
@@ -102,6 +119,7 @@ class RecordsPerHostedZoneCheck(InstanceQuotaCheck):
     description = "Records per Route53 Hosted Zone"
     instance_id = "Hosted Zone ID"
     service_code = "route53"
+    global_service = True
 
     @staticmethod
     def get_all_identifiers(session: boto3.Session) -> typing.List[str]:
@@ -110,16 +128,14 @@ class RecordsPerHostedZoneCheck(InstanceQuotaCheck):
     @property
     def maximum(self):
         try:
-            return get_route53_hosted_zone_limits(self.boto_session, "MAX_RRSETS_BY_ZONE", self.instance_id)["Limit"]["Value"]
-        except self.boto_session.client("route53").exceptions.NoSuchHostedZone as e:
+            return get_route53_hosted_zone_limit_value(self.boto_session, "MAX_RRSETS_BY_ZONE", self.instance_id)
+        except get_client(self.boto_session, "route53").exceptions.NoSuchHostedZone as e:
             raise InstanceWithIdentifierNotFound(self) from e
 
-    @property
-    def current(self):
-        try:
-            return get_route53_hosted_zone_limits(self.boto_session, "MAX_RRSETS_BY_ZONE", self.instance_id)["Count"]
-        except self.boto_session.client("route53").exceptions.NoSuchHostedZone as e:
-            raise InstanceWithIdentifierNotFound(self) from e
+    @classmethod
+    def batch_current(cls, session: boto3.Session) -> typing.Dict[str, int]:
+        # the listing already contains the record count of every zone
+        return {zone["Id"]: zone["ResourceRecordSetCount"] for zone in list_route53_hosted_zones(session)}
 
 
 class AssociatedVpcHostedZoneCheck(InstanceQuotaCheck):
@@ -127,6 +143,7 @@ class AssociatedVpcHostedZoneCheck(InstanceQuotaCheck):
     description = "Associated VPCs per Route53 Hosted Zone"
     instance_id = "Hosted Zone ID"
     service_code = "route53"
+    global_service = True
 
     @staticmethod
     def get_all_identifiers(session: boto3.Session) -> typing.List[str]:
@@ -135,13 +152,13 @@ class AssociatedVpcHostedZoneCheck(InstanceQuotaCheck):
     @property
     def maximum(self):
         try:
-            return get_route53_hosted_zone_limits(self.boto_session, "MAX_VPCS_ASSOCIATED_BY_ZONE", self.instance_id)["Limit"]["Value"]
-        except self.boto_session.client("route53").exceptions.NoSuchHostedZone as e:
+            return get_route53_hosted_zone_limit_value(self.boto_session, "MAX_VPCS_ASSOCIATED_BY_ZONE", self.instance_id)
+        except get_client(self.boto_session, "route53").exceptions.NoSuchHostedZone as e:
             raise InstanceWithIdentifierNotFound(self) from e
 
     @property
     def current(self):
         try:
             return get_route53_hosted_zone_limits(self.boto_session, "MAX_VPCS_ASSOCIATED_BY_ZONE", self.instance_id)["Count"]
-        except self.boto_session.client("route53").exceptions.NoSuchHostedZone as e:
+        except get_client(self.boto_session, "route53").exceptions.NoSuchHostedZone as e:
             raise InstanceWithIdentifierNotFound(self) from e
@@ -1,3 +1,4 @@
+from aws_quota.utils import get_client
 from .quota_check import QuotaCheck, QuotaScope
 
 
@@ -10,7 +11,7 @@ class EndpointCountCheck(QuotaCheck):
 
     @property
     def current(self):
-        return len(self.boto_session.client('route53resolver').list_resolver_endpoints()['ResolverEndpoints'])
+        return len(get_client(self.boto_session, 'route53resolver').list_resolver_endpoints()['ResolverEndpoints'])
 
 class RulesCountCheck(QuotaCheck):
     key = "route53resolver_rule_count"
@@ -21,7 +22,7 @@ class RulesCountCheck(QuotaCheck):
 
     @property
     def current(self):
-        return len(self.boto_session.client('route53resolver').list_resolver_rules()['ResolverRules'])
+        return len(get_client(self.boto_session, 'route53resolver').list_resolver_rules()['ResolverRules'])
 
 class RuleAssociationsCountCheck(QuotaCheck):
     key = "route53resolver_rule_association_count"
@@ -32,4 +33,4 @@ class RuleAssociationsCountCheck(QuotaCheck):
 
     @property
     def current(self):
-        return len(self.boto_session.client('route53resolver').list_resolver_rule_associations()['ResolverRuleAssociations'])
+        return len(get_client(self.boto_session, 'route53resolver').list_resolver_rule_associations()['ResolverRuleAssociations'])
@@ -1,3 +1,4 @@
+from aws_quota.utils import get_client
 from .quota_check import QuotaCheck, QuotaScope
 
 
@@ -11,4 +12,4 @@ class BucketCountCheck(QuotaCheck):
 
     @property
     def current(self):
-        return len(self.boto_session.client('s3').list_buckets()['Buckets'])
+        return len(get_client(self.boto_session, 's3').list_buckets()['Buckets'])
@@ -1,22 +1,45 @@
-import cachetools
-from aws_quota.exceptions import InstanceWithIdentifierNotFound, NotImplementedInFavourOfCloudWatch
-from aws_quota.utils import get_paginated_results
+from aws_quota.exceptions import NotImplementedInFavourOfCloudWatch
+from aws_quota.utils import get_paginated_results, get_client, map_concurrently
 import typing
 import boto3
+from aws_quota.inventory import INVENTORY
 from .quota_check import QuotaCheck, InstanceQuotaCheck, QuotaScope
 
 
-@cachetools.cached(cache=cachetools.TTLCache(maxsize=1, ttl=60))
+class TopicSubscriptions(typing.NamedTuple):
+    confirmed: int
+    pending: int
+
+
+@INVENTORY.collection
 def get_all_sns_topic_arns(session: boto3.Session) -> typing.List[str]:
     return [topic['TopicArn'] for topic in get_paginated_results(session, 'sns', 'list_topics', 'Topics')]
 
-@cachetools.cached(cache=cachetools.TTLCache(maxsize=3000, ttl=60))
-def get_topic_attributes(session: boto3.Session, topic_arn) -> typing.List[str]:
-    return session.client('sns').get_topic_attributes(TopicArn=topic_arn)
+@INVENTORY.collection
+def get_all_topic_subscriptions(session: boto3.Session) -> typing.Dict[str, TopicSubscriptions]:
+    """Subscription counts of every topic, the attributes of all topics are fetched concurrently once per generation"""
+    client = get_client(session, 'sns')
+
+    def get_subscriptions(topic_arn: str) -> typing.Optional[TopicSubscriptions]:
+        try:
+            attributes = client.get_topic_attributes(TopicArn=topic_arn)['Attributes']
+        except client.exceptions.NotFoundException:
+            # deleted since it was listed
+            return None
+
+        return TopicSubscriptions(int(attributes['SubscriptionsConfirmed']), int(attributes['SubscriptionsPending']))
+
+    topic_arns = get_all_sns_topic_arns(session)
+    return {
+        topic_arn: subscriptions
+        for topic_arn, subscriptions in zip(topic_arns, map_concurrently(get_subscriptions, topic_arns))
+        if subscriptions is not None
+    }
 
 class TopicCountCheck(QuotaCheck):
     key = "sns_topics_count"
-    scope = QuotaScope.ACCOUNT
+    # topics and subscriptions are listed per region, so the check has to run in every region
+    scope = QuotaScope.REGION
     service_code = 'sns'
     quota_code = 'L-61103206'
     description = "The maximum number of Amazon SNS topics that an AWS account can create across all regions."
@@ -27,20 +50,15 @@ class TopicCountCheck(QuotaCheck):
 
 class PendingSubscriptionCountCheck(QuotaCheck):
     key = "sns_pending_subscriptions_count"
-    scope = QuotaScope.ACCOUNT
+    # topics and subscriptions are listed per region, so the check has to run in every region
+    scope = QuotaScope.REGION
     service_code = 'sns'
     quota_code = 'L-1A43D3DB'
     description = "The maximum number of pending subscriptions per AWS account, across all regions."
 
     @property
     def current(self):
-        all_topic_arns = get_all_sns_topic_arns(self.boto_session)
-        pending_subs = 0
-
-        for arn in all_topic_arns:
-            pending_subs += int(get_topic_attributes(self.boto_session, arn)['Attributes']['SubscriptionsPending'])
-
-        return pending_subs
+        return sum(subscriptions.pending for subscriptions in get_all_topic_subscriptions(self.boto_session).values())
 
 
 class SubscriptionsPerTopicCheck(InstanceQuotaCheck):
@@ -54,14 +72,12 @@ class SubscriptionsPerTopicCheck(InstanceQuotaCheck):
     def get_all_identifiers(session: boto3.Session) -> typing.List[str]:
         return get_all_sns_topic_arns(session)
 
-    @property
-    def current(self):
-        try:
-            topic_attrs = get_topic_attributes(self.boto_session, self.instance_id)['Attributes']
-        except self.boto_session.client('sns').exceptions.NotFoundException as e:
-            raise InstanceWithIdentifierNotFound(self) from e
-
-        return int(topic_attrs['SubscriptionsConfirmed']) + int(topic_attrs['SubscriptionsPending'])
+    @classmethod
+    def batch_current(cls, session: boto3.Session) -> typing.Dict[str, int]:
+        return {
+            topic_arn: subscriptions.confirmed + subscriptions.pending
+            for topic_arn, subscriptions in get_all_topic_subscriptions(session).items()
+        }
 
 
 class MessagesPublishedPerSecondCheck(QuotaCheck):
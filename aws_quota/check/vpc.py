@@ -1,34 +1,25 @@
+from aws_quota.inventory import INVENTORY
 from .quota_check import QuotaCheck, InstanceQuotaCheck, QuotaScope
 from aws_quota.exceptions import InstanceWithIdentifierNotFound
-from aws_quota.utils import get_paginated_results
+from aws_quota.utils import get_paginated_results, get_client
 import boto3
-import botocore.exceptions
-import cachetools
+import collections
 import typing
 
 
-def check_if_vpc_exists(session: boto3.Session, vpc_id: str) -> bool:
-    client = session.client('ec2')
-    try:
-        client.describe_vpcs(VpcIds=[vpc_id])
-    except botocore.exceptions.ClientError:
-        return False
-    return True
-
-
-@cachetools.cached(cache=cachetools.TTLCache(1, 60))
+@INVENTORY.collection
 def get_all_vpcs(session: boto3.Session) -> typing.List[dict]:
     return get_paginated_results(session, 'ec2', 'describe_vpcs', 'Vpcs')
 
-@cachetools.cached(cache=cachetools.TTLCache(1, 60))
+@INVENTORY.collection
 def get_all_subnets(session: boto3.Session) -> typing.List[dict]:
     return get_paginated_results(session, 'ec2', 'describe_subnets', 'Subnets')
 
-@cachetools.cached(cache=cachetools.TTLCache(1, 60))
+@INVENTORY.collection
 def get_all_nat_gateways(session: boto3.Session) -> typing.List[dict]:
     return get_paginated_results(session, 'ec2', 'describe_nat_gateways', 'NatGateways')
 
-@cachetools.cached(cache=cachetools.TTLCache(10, 60))
+@INVENTORY.collection
 def count_nat_gateways_by_az(session: boto3.Session, az_name: str) -> int:
     nat_count_by_az = {}
     subnet_id_to_az = {}
@@ -44,47 +35,71 @@ def count_nat_gateways_by_az(session: boto3.Session, az_name: str) -> int:
 
     return nat_count_by_az.get(az_name)
 
+@INVENTORY.collection
+def get_vpcs_by_id(session: boto3.Session) -> typing.Dict[str, dict]:
+    return {vpc['VpcId']: vpc for vpc in get_all_vpcs(session)}
+
 def get_vpc_by_id(session: boto3.Session, vpc_id: str) -> dict:
-    try:
-        return next(filter(lambda vpc: vpc_id == vpc['VpcId'], get_all_vpcs(session)))
-    except StopIteration:
-        raise KeyError
+    return get_vpcs_by_id(session)[vpc_id]
+
+def count_by_vpc(session: boto3.Session, resources: typing.List[dict]) -> typing.Dict[str, int]:
+    counts = collections.Counter(resource['VpcId'] for resource in resources)
+    return {vpc['VpcId']: counts[vpc['VpcId']] for vpc in get_all_vpcs(session)}
 
-@cachetools.cached(cache=cachetools.TTLCache(1, 60))
+@INVENTORY.collection
 def get_vpc_peering_connections(session: boto3.Session) -> typing.List[dict]:
-    return session.client('ec2').describe_vpc_peering_connections(
+    return get_client(session, 'ec2').describe_vpc_peering_connections(
         Filters=[
             {'Name': 'status-code', 'Values': ['active']},
         ]
     )['VpcPeeringConnections']
 
-@cachetools.cached(cache=cachetools.TTLCache(1, 60))
+@INVENTORY.collection
+def count_vpc_peering_connections_by_vpc(session: boto3.Session) -> typing.Dict[str, int]:
+    peering_connections_by_vpc = collections.Counter()
+    for peering_connection in get_vpc_peering_connections(session):
+        for vpc_info in [peering_connection['AccepterVpcInfo'], peering_connection['RequesterVpcInfo']]:
+            if session.region_name == vpc_info['Region']:
+                peering_connections_by_vpc[vpc_info['VpcId']] += 1
+
+    return peering_connections_by_vpc
+
+@INVENTORY.collection
 def get_all_sgs(session: boto3.Session) -> typing.List[dict]:
     return get_paginated_results(session, 'ec2', 'describe_security_groups', 'SecurityGroups')
 
 
+@INVENTORY.collection
+def get_sgs_by_id(session: boto3.Session) -> typing.Dict[str, dict]:
+    return {sg['GroupId']: sg for sg in get_all_sgs(session)}
+
+
 def get_sg_by_id(session: boto3.Session, sg_id: str) -> dict:
-    try:
-        return next(filter(lambda sg: sg_id == sg['GroupId'], get_all_sgs(session)))
-    except StopIteration:
-        raise KeyError
+    return get_sgs_by_id(session)[sg_id]
 
 
-@cachetools.cached(cache=cachetools.TTLCache(1, 60))
+@INVENTORY.collection
 def get_all_rts(session: boto3.Session) -> typing.List[dict]:
-    return session.client('ec2').describe_route_tables()['RouteTables']
+    return get_paginated_results(session, 'ec2', 'describe_route_tables', 'RouteTables')
+
+
+@INVENTORY.collection
+def get_rts_by_id(session: boto3.Session) -> typing.Dict[str, dict]:
+    return {rt['RouteTableId']: rt for rt in get_all_rts(session)}
 
 
 def get_rt_by_id(session: boto3.Session, rt_id: str) -> dict:
-    try:
-        return next(filter(lambda rt: rt_id == rt['RouteTableId'], get_all_rts(session)))
-    except StopIteration:
-        raise KeyError
+    return get_rts_by_id(session)[rt_id]
 
 
-@cachetools.cached(cache=cachetools.TTLCache(1, 60))
+@INVENTORY.collection
 def get_all_network_acls(session: boto3.Session) -> typing.List[dict]:
-    return session.client('ec2').describe_network_acls()['NetworkAcls']
+    return get_paginated_results(session, 'ec2', 'describe_network_acls', 'NetworkAcls')
+
+
+@INVENTORY.collection
+def get_network_acls_by_id(session: boto3.Session) -> typing.Dict[str, dict]:
+    return {acl['NetworkAclId']: acl for acl in get_all_network_acls(session)}
 
 
 class VpcCountCheck(QuotaCheck):
@@ -191,16 +206,10 @@ class RouteTablesPerVpcCheck(InstanceQuotaCheck):
     def get_all_identifiers(session: boto3.Session) -> typing.List[str]:
         return [vpc['VpcId'] for vpc in get_all_vpcs(session)]
 
-    @property
-    def current(self):
-        if check_if_vpc_exists(self.boto_session, self.instance_id):
-            return len(self.boto_session.client('ec2').describe_route_tables(Filters=[
-                {
-                    'Name': 'vpc-id',
-                    'Values': [self.instance_id]
-                }])['RouteTables'])
-        else:
-            raise InstanceWithIdentifierNotFound(self)
+    @classmethod
+    @INVENTORY.collection
+    def batch_current(cls, session: boto3.Session) -> typing.Dict[str, int]:
+        return count_by_vpc(session, get_all_rts(session))
 
 
 class RoutesPerRouteTableCheck(InstanceQuotaCheck):
@@ -234,16 +243,10 @@ class SubnetsPerVpcCheck(InstanceQuotaCheck):
     def get_all_identifiers(session: boto3.Session) -> typing.List[str]:
         return [vpc['VpcId'] for vpc in get_all_vpcs(session)]
 
-    @property
-    def current(self):
-        if check_if_vpc_exists(self.boto_session, self.instance_id):
-            return len(self.boto_session.client('ec2').describe_subnets(Filters=[
-                {
-                    'Name': 'vpc-id',
-                    'Values': [self.instance_id]
-                }])['Subnets'])
-        else:
-            raise InstanceWithIdentifierNotFound(self)
+    @classmethod
+    @INVENTORY.collection
+    def batch_current(cls, session: boto3.Session) -> typing.Dict[str, int]:
+        return count_by_vpc(session, get_all_subnets(session))
 
 
 class AclsPerVpcCheck(InstanceQuotaCheck):
@@ -257,16 +260,10 @@ class AclsPerVpcCheck(InstanceQuotaCheck):
     def get_all_identifiers(session: boto3.Session) -> typing.List[str]:
         return [vpc['VpcId'] for vpc in get_all_vpcs(session)]
 
-    @property
-    def current(self) -> int:
-        if check_if_vpc_exists(self.boto_session, self.instance_id):
-            return len(self.boto_session.client('ec2').describe_network_acls(Filters=[
-                {
-                    'Name': 'vpc-id',
-                    'Values': [self.instance_id]
-                }])['NetworkAcls'])
-        else:
-            raise InstanceWithIdentifierNotFound(self)
+    @classmethod
+    @INVENTORY.collection
+    def batch_current(cls, session: boto3.Session) -> typing.Dict[str, int]:
+        return count_by_vpc(session, get_all_network_acls(session))
 
 
 class RulesPerAclCheck(InstanceQuotaCheck):
@@ -282,10 +279,9 @@ class RulesPerAclCheck(InstanceQuotaCheck):
 
     @property
     def current(self) -> int:
-        acls = get_all_network_acls(self.boto_session)
-        if self.instance_id in [acl['NetworkAclId'] for acl in acls]:
-            return len(next(filter(lambda acl: self.instance_id == acl['NetworkAclId'], acls))['Entries'])
-        else:
+        try:
+            return len(get_network_acls_by_id(self.boto_session)[self.instance_id]['Entries'])
+        except KeyError:
             raise InstanceWithIdentifierNotFound(self)
 
 
@@ -344,15 +340,9 @@ class ActiveVpcPeeringConnectionsPerVpcCheck(InstanceQuotaCheck):
 
     @property
     def current(self) -> int:
-        peering_connections_per_vpc = 0
         try:
             vpc = get_vpc_by_id(self.boto_session, self.instance_id)
-            vpc_peering_connections = get_vpc_peering_connections(self.boto_session)
-            for peering_connection in vpc_peering_connections:
-                for vpc_info in [peering_connection['AccepterVpcInfo'], peering_connection['RequesterVpcInfo']]:
-                    if vpc_info['VpcId'] == vpc['VpcId'] and self.boto_session.region_name == vpc_info['Region']:
-                        peering_connections_per_vpc += 1
-
-            return peering_connections_per_vpc
         except KeyError:
             raise InstanceWithIdentifierNotFound(self)
+
+        return count_vpc_peering_connections_by_vpc(self.boto_session)[vpc['VpcId']]
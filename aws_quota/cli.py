@@ -1,6 +1,7 @@
+import dataclasses
 import logging
 from textwrap import shorten
-from aws_quota.utils import get_account_id
+from aws_quota.utils import configure_client_pool, get_account_id
 import enum
 import typing
 import sys
@@ -8,8 +9,10 @@ import boto3
 import click
 import tabulate
 
-from aws_quota.check.quota_check import InstanceQuotaCheck, QuotaCheck, QuotaScope
+from aws_quota.check.quota_check import SERVICE_QUOTA_TABLES, InstanceQuotaCheck, QuotaCheck, QuotaScope
 from aws_quota.check import ALL_CHECKS, ALL_INSTANCE_SCOPED_CHECKS
+from aws_quota.organization import DEFAULT_ROLE_SESSION_NAME, list_organization_accounts, read_accounts_file
+from aws_quota.ratelimit import DEFAULT_RATE, RateLimiter
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +53,18 @@ def set_quota_limit_overrides(limitOverrides: typing.Dict[str, int]):
     for quotaName, limitValue in limitOverrides.items():
         set_quota_limit_override(quotaName, limitValue)
 
+def create_sessions(regions: typing.Tuple[str], profile: str) -> typing.List[boto3.Session]:
+    """One session per distinct region, regions may be repeated or comma separated. Defaults to the current region"""
+    region_names = [region for value in regions for region in value.split(',') if region]
+
+    if not region_names:
+        return [boto3.Session(profile_name=profile)]
+
+    return [boto3.Session(region_name=region, profile_name=profile) for region in dict.fromkeys(region_names)]
+
+def session_regions(sessions: typing.List[boto3.Session]) -> str:
+    return ','.join(str(session.region_name) for session in sessions)
+
 class Runner:
     class ReportResult(enum.Enum):
         SUCCESS = 0
@@ -57,13 +72,12 @@ class Runner:
         ERROR = 2
         FAIL = 3
 
-    def __init__(self, session: boto3.Session,
+    def __init__(self,
                  checks: typing.List[QuotaCheck],
                  warning_threshold: float,
                  error_threshold: float,
                  fail_on_error: bool) -> None:
 
-        self.session = session
         self.checks = checks
         self.warning_threshold = warning_threshold
         self.error_threshold = error_threshold
@@ -106,9 +120,24 @@ class Runner:
         errors = 0
         warnings = 0
 
+        batch_currents = {}
+
         for chk in self.checks:
             try:
-                current = chk.current
+                if isinstance(chk, InstanceQuotaCheck) and chk.supports_batch_current():
+                    batch_key = (type(chk), chk.boto_session)
+                    if batch_key not in batch_currents:
+                        try:
+                            batch_currents[batch_key] = chk.batch_current(chk.boto_session)
+                        except Exception as e:
+                            # don't retry a failed batch for every single instance
+                            batch_currents[batch_key] = e
+
+                    if isinstance(batch_currents[batch_key], Exception):
+                        raise batch_currents[batch_key]
+                    current = batch_currents[batch_key][chk.instance_id]
+                else:
+                    current = chk.current
             except Exception as e:
                 logger.debug(e, exc_info=True)
                 current = None
@@ -120,11 +149,11 @@ class Runner:
                 maximum = None
 
             if chk.scope == QuotaScope.ACCOUNT:
-                scope = get_account_id(self.session)
+                scope = get_account_id(chk.boto_session)
             elif chk.scope == QuotaScope.REGION:
-                scope = f'{get_account_id(self.session)}/{self.session.region_name}'
+                scope = f'{get_account_id(chk.boto_session)}/{chk.boto_session.region_name}'
             elif chk.scope == QuotaScope.INSTANCE:
-                scope = f'{get_account_id(self.session)}/{self.session.region_name}/{chk.instance_id}'
+                scope = f'{get_account_id(chk.boto_session)}/{chk.boto_session.region_name}/{chk.instance_id}'
 
             result = self.__report(chk.key, shorten(text=chk.description, width=75), scope, current, maximum)
 
@@ -143,23 +172,36 @@ class Runner:
 @click.option('--debug/--no-debug', "debug", default=False)
 @click.option('--limit-override', "limitOverrides", type=(str, int), multiple=True)
 def cli(debug, limitOverrides):
+    configure_logging(debug)
+    set_quota_limit_overrides(dict(limitOverrides))
+
+def configure_logging(debug: bool):
     logging.basicConfig(
         level=logging.DEBUG if debug else logging.INFO,
         format='%(asctime)s [%(levelname)s] %(name)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S'
     )
     logging.getLogger('botocore.credentials').setLevel(logging.WARNING)
 
-    set_quota_limit_overrides(dict(limitOverrides))
-
 def common_scope_options(function):
     function = click.option(
-        '--region', help='Region to use for region scoped quotas, defaults to current')(function)
+        '--region', "regions", multiple=True,
+        help='Regions to use for region scoped quotas, can be repeated or comma separated, defaults to current')(function)
     function = click.option(
         '--profile', help='AWS profile name to use, defaults to current')(function)
 
     return function
 
 
+def common_rate_limit_options(function):
+    function = click.option(
+        '--default-rate-limit', help=f'Maximum number of AWS API requests per second per service, defaults to {DEFAULT_RATE}', default=DEFAULT_RATE)(function)
+    function = click.option(
+        '--rate-limit', "rateLimits", type=(str, float), multiple=True,
+        help='Override the maximum number of AWS API requests per second for a single service, e.g. --rate-limit ec2 50')(function)
+
+    return function
+
+
 def common_check_options(function):
     function = click.option(
         '--warning-threshold', help='Warning threshold percentage for quota utilization, defaults to 0.8', default=0.8)(function)
@@ -173,9 +215,10 @@ def common_check_options(function):
 
 @cli.command()
 @common_scope_options
+@common_rate_limit_options
 @common_check_options
 @click.argument('check-keys')
-def check(check_keys, region, profile, warning_threshold, error_threshold, fail_on_warning):
+def check(check_keys, regions, profile, default_rate_limit, rateLimits, warning_threshold, error_threshold, fail_on_warning):
     """Run checks identified by CHECK_KEYS
 
     e.g. check vpc_count,ecs_count
@@ -192,40 +235,50 @@ def check(check_keys, region, profile, warning_threshold, error_threshold, fail_
 
     selected_checks = check_keys_to_check_classes(check_keys)
 
-    session = boto3.Session(region_name=region, profile_name=profile)
+    sessions = create_sessions(regions, profile)
+    rate_limiter = RateLimiter(default_rate_limit, dict(rateLimits))
+    for session in sessions:
+        rate_limiter.install(session)
 
     click.echo(
-        f'AWS profile: {session.profile_name} | AWS region: {session.region_name} | Active checks: {",".join([check.key for check in selected_checks])}')
+        f'AWS profile: {sessions[0].profile_name} | AWS region: {session_regions(sessions)} | Active checks: {",".join([check.key for check in selected_checks])}')
 
     checks = []
 
     with click.progressbar(selected_checks, label='Collecting checks', show_eta=False) as selected_checks:
         for chk in selected_checks:
-            if issubclass(chk, InstanceQuotaCheck):
-                for identifier in chk.get_all_identifiers(session):
-                    checks.append(
-                        chk(session, identifier)
-                    )
-            else:
-                checks.append(chk(session))
-
-    Runner(session, checks, warning_threshold,
+            for session in chk.sessions_to_check(sessions):
+                if issubclass(chk, InstanceQuotaCheck):
+                    for identifier in chk.get_all_identifiers(session):
+                        checks.append(
+                            chk(session, identifier)
+                        )
+                else:
+                    checks.append(chk(session))
+
+    Runner(checks, warning_threshold,
            error_threshold, fail_on_warning).run_checks()
 
 
 @cli.command()
 @common_scope_options
+@common_rate_limit_options
 @common_check_options
 @click.argument('check-key', type=click.Choice([chk.key for chk in ALL_INSTANCE_SCOPED_CHECKS]))
 @click.argument('instance-id')
-def check_instance(check_key, instance_id, region, profile, warning_threshold, error_threshold, fail_on_warning):
+def check_instance(check_key, instance_id, regions, profile, default_rate_limit, rateLimits, warning_threshold, error_threshold, fail_on_warning):
     """Run single check for single instance
 
     e.g. check-instance vpc_acls_per_vpc vpc-0123456789
 
     Execute list-checks command to get available instance checks"""
 
-    session = boto3.Session(region_name=region, profile_name=profile)
+    sessions = create_sessions(regions, profile)
+    if len(sessions) > 1:
+        raise click.UsageError('check-instance accepts a single region only')
+
+    session = sessions[0]
+    RateLimiter(default_rate_limit, dict(rateLimits)).install(session)
 
     selected_check = next(
         filter(lambda mon: mon.key == check_key, ALL_INSTANCE_SCOPED_CHECKS), None)
@@ -235,20 +288,37 @@ def check_instance(check_key, instance_id, region, profile, warning_threshold, e
 
     chk = selected_check(session, instance_id)
 
-    Runner(session, [chk], warning_threshold,
+    Runner([chk], warning_threshold,
            error_threshold, fail_on_warning).run_checks()
 
 
 @cli.command()
 @common_scope_options
+@common_rate_limit_options
 @click.option('--port', help='Port on which to expose the Prometheus /metrics endpoint, defaults to 8080', default=8080)
 @click.option('--namespace', help='Namespace/prefix for Prometheus metrics, defaults to awsquota', default='awsquota')
 @click.option('--limits-check-interval', help='Interval in seconds at which to check the limit quota value, defaults to 600', default=600)
-@click.option('--currents-check-interval', help='Interval in seconds at which to check the current quota value, defaults to 300', default=300)
+@click.option('--currents-check-interval', help='Interval in seconds at which to check the current quota value while its limit is unknown, defaults to 300', default=300)
+@click.option('--min-currents-check-interval', help='Interval in seconds at which to check current quota values that reached --utilization-threshold, defaults to 60', default=60)
+@click.option('--max-currents-check-interval', help='Interval in seconds at which to check current quota values that are far from their limit, defaults to 1800', default=1800)
+@click.option('--utilization-threshold', help='Utilization from which current quota values are checked every --min-currents-check-interval, defaults to 0.8', type=float, default=0.8)
 @click.option('--reload-checks-interval', help='Interval in seconds at which to collect new checks e.g. when a new resource has been created, defaults to 600', default=600)
+@click.option('--quota-table-refresh-interval', help='Interval in seconds at which the quota values of a service are reloaded from AWS Service Quotas, defaults to 3600', default=3600)
 @click.option('--enable-duration-metrics/--disable-duration-metrics', help='Flag to control whether to collect/expose duration metrics, defaults to true', default=True)
+@click.option('--max-workers', help='Number of worker threads that execute checks concurrently, defaults to 16', default=16)
+@click.option('--max-workers-per-service', help='Maximum number of checks of the same service code that are executed concurrently, defaults to 4', default=4)
+@click.option('--service-concurrency', "serviceConcurrency", type=(str, int), multiple=True, help='Override the maximum number of concurrent checks for a single service code, e.g. --service-concurrency vpc 8')
+@click.option('--evict-after-passes', help='Number of passes after which series that have not been refreshed anymore are removed, defaults to 3', default=3)
+@click.option('--snapshot-file', type=click.Path(dir_okay=False), help='SQLite file to save the results to after every pass, results saved by a previous run are served until they are refreshed')
+@click.option('--account', "accounts", multiple=True, help='ID of an account to check by assuming --assume-role in it, can be repeated')
+@click.option('--accounts-file', type=click.Path(exists=True, dir_okay=False), help='File with one account ID per line to check by assuming --assume-role in each of them')
+@click.option('--organization/--no-organization', help='Check all active accounts of the AWS Organization by assuming --assume-role in each of them, defaults to false', default=False)
+@click.option('--assume-role', help='Name of the IAM role to assume in every account')
+@click.option('--role-session-name', help=f'Session name to use when assuming --assume-role, defaults to {DEFAULT_ROLE_SESSION_NAME}', default=DEFAULT_ROLE_SESSION_NAME)
+@click.option('--external-id', help='External ID to use when assuming --assume-role')
+@click.option('--worker-processes', help='Number of processes that the accounts are distributed across, defaults to 4', default=4)
 @click.argument('check-keys')
-def prometheus_exporter(check_keys, region, profile, port, namespace, limits_check_interval, currents_check_interval, reload_checks_interval, enable_duration_metrics):
+def prometheus_exporter(check_keys, regions, profile, default_rate_limit, rateLimits, port, namespace, limits_check_interval, currents_check_interval, min_currents_check_interval, max_currents_check_interval, utilization_threshold, reload_checks_interval, quota_table_refresh_interval, enable_duration_metrics, max_workers, max_workers_per_service, serviceConcurrency, evict_after_passes, snapshot_file, accounts, accounts_file, organization, assume_role, role_session_name, external_id, worker_processes):
     """Start a Prometheus exporter for quota checks
 
     Set checks to execute with CHECK_KEYS
@@ -262,15 +332,15 @@ def prometheus_exporter(check_keys, region, profile, port, namespace, limits_che
     Execute list-checks command to get available check keys
 
     Pass all to run all checks
+
+    To check multiple accounts, pass them with --account, --accounts-file or --organization
+    together with the name of the role to assume in each of them with --assume-role
     """
     from aws_quota.prometheus import PrometheusExporter, PrometheusExporterSettings
 
     selected_checks = check_keys_to_check_classes(check_keys)
-
-    session = boto3.Session(region_name=region, profile_name=profile)
-
-    click.echo(
-        f'AWS profile: {session.profile_name} | AWS region: {session.region_name} | Active checks: {",".join([check.key for check in selected_checks])}')
+    SERVICE_QUOTA_TABLES.refresh_interval = quota_table_refresh_interval
+    configure_client_pool(max_workers)
 
     settings = PrometheusExporterSettings(
         port=port,
@@ -278,10 +348,72 @@ def prometheus_exporter(check_keys, region, profile, port, namespace, limits_che
         get_currents_interval=currents_check_interval,
         get_limits_interval=limits_check_interval,
         reload_checks_interval=reload_checks_interval,
-        enable_duration_metrics=enable_duration_metrics
+        enable_duration_metrics=enable_duration_metrics,
+        max_workers=max_workers,
+        max_workers_per_service=max_workers_per_service,
+        service_concurrency=dict(serviceConcurrency),
+        evict_after_passes=evict_after_passes,
+        min_currents_interval=min_currents_check_interval,
+        max_currents_interval=max_currents_check_interval,
+        utilization_threshold=utilization_threshold,
+        snapshot_file=snapshot_file
     )
 
-    PrometheusExporter(session, selected_checks, settings).start()
+    if accounts or accounts_file or organization:
+        if not assume_role:
+            raise click.UsageError('--assume-role is required to check other accounts')
+
+        from aws_quota.workers import WorkerConfig, WorkerPool, shard_accounts
+
+        source_session = boto3.Session(profile_name=profile)
+        account_ids = list(accounts)
+        if accounts_file:
+            account_ids += read_accounts_file(accounts_file)
+        if organization:
+            account_ids += list_organization_accounts(source_session)
+        account_ids = list(dict.fromkeys(account_ids))
+        if not account_ids:
+            raise click.UsageError('no accounts to check, --account, --accounts-file and --organization yielded none')
+
+        region_names = [session.region_name for session in create_sessions(regions, profile)]
+
+        click.echo(
+            f'AWS profile: {source_session.profile_name} | AWS accounts: {len(account_ids)} | AWS region: {",".join(map(str, region_names))} | Active checks: {",".join([check.key for check in selected_checks])}')
+
+        limit_overrides = {chk.key: chk.quota_limit_override for chk in ALL_CHECKS if chk.quota_limit_override is not None}
+        configs = [
+            WorkerConfig(
+                index=index,
+                accounts=shard,
+                regions=region_names,
+                profile=profile,
+                role_name=assume_role,
+                role_session_name=role_session_name,
+                external_id=external_id,
+                check_keys=[chk.key for chk in selected_checks],
+                limit_overrides=limit_overrides,
+                default_rate_limit=default_rate_limit,
+                rate_limits=dict(rateLimits),
+                quota_table_refresh_interval=quota_table_refresh_interval,
+                # workers check different accounts, so each of them has its own snapshot file
+                settings=dataclasses.replace(settings, snapshot_file=f'{snapshot_file}.{index}' if snapshot_file else None),
+                debug=logging.getLogger().isEnabledFor(logging.DEBUG)
+            )
+            for index, shard in enumerate(shard_accounts(account_ids, worker_processes))
+        ]
+
+        WorkerPool(namespace, configs).start(port)
+        return
+
+    sessions = create_sessions(regions, profile)
+    rate_limiter = RateLimiter(default_rate_limit, dict(rateLimits))
+    for session in sessions:
+        rate_limiter.install(session)
+
+    click.echo(
+        f'AWS profile: {sessions[0].profile_name} | AWS region: {session_regions(sessions)} | Active checks: {",".join([check.key for check in selected_checks])}')
+
+    PrometheusExporter(sessions, selected_checks, settings, rate_limiter).start()
 
 
 @cli.command()
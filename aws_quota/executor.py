@@ -0,0 +1,85 @@
+import collections
+import concurrent.futures
+import logging
+import threading
+import typing
+
+logger = logging.getLogger(__name__)
+
+
+class CheckExecutor:
+    """Runs blocking check calls on a bounded thread pool
+
+    Each submission is tagged with the service code of the check it belongs to.
+    No more than the service's concurrency cap is running at any time, everything
+    above that waits in a per-service queue, so one slow service can't occupy the whole pool.
+    """
+
+    def __init__(self,
+                 max_workers: int,
+                 max_workers_per_service: int,
+                 service_concurrency: typing.Dict[str, int] = None) -> None:
+        self.max_workers = max_workers
+        self.max_workers_per_service = max_workers_per_service
+        self.service_concurrency = service_concurrency or {}
+
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='aws-quota-check')
+        self._lock = threading.Lock()
+        self._running = collections.Counter()
+        self._pending = collections.defaultdict(collections.deque)
+
+    def service_limit(self, service: str) -> int:
+        return max(1, min(self.service_concurrency.get(service, self.max_workers_per_service), self.max_workers))
+
+    @property
+    def queue_depth(self) -> int:
+        with self._lock:
+            return sum(len(queue) for queue in self._pending.values())
+
+    def submit(self, service: str, fn: typing.Callable, *args, **kwargs) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+
+        with self._lock:
+            self._pending[service].append((future, fn, args, kwargs))
+            self._dispatch(service)
+
+        return future
+
+    def _dispatch(self, service: str):
+        # caller has to hold self._lock
+        queue = self._pending[service]
+
+        while queue and self._running[service] < self.service_limit(service):
+            future, fn, args, kwargs = queue.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            self._running[service] += 1
+            self._pool.submit(self._run, service, future, fn, args, kwargs)
+
+    def _run(self, service: str, future: concurrent.futures.Future, fn: typing.Callable, args, kwargs):
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            exception = e
+        else:
+            exception = None
+
+        with self._lock:
+            self._running[service] -= 1
+            self._dispatch(service)
+
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def shutdown(self):
+        with self._lock:
+            for queue in self._pending.values():
+                for future, *_ in queue:
+                    future.cancel()
+                queue.clear()
+
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,151 @@
+import dataclasses
+import functools
+import gzip
+import http.server
+import json
+import logging
+import threading
+import time
+import typing
+
+from prometheus_client.exposition import choose_encoder
+from prometheus_client.registry import CollectorRegistry
+
+logger = logging.getLogger(__name__)
+
+# metrics that aren't part of the results snapshot, e.g. rate limiter or inventory stats,
+# are at most this many seconds old
+DEFAULT_MAX_AGE = 10.0
+GZIP_LEVEL = 6
+
+
+@dataclasses.dataclass(frozen=True)
+class Response:
+    status: int
+    content_type: str
+    body: bytes
+    headers: typing.Dict[str, str] = dataclasses.field(default_factory=dict)
+
+
+# a route answers a GET request given its headers, without touching AWS
+Route = typing.Callable[[typing.Mapping[str, str]], Response]
+
+
+def text_response(status: int, text: str) -> Response:
+    return Response(status, 'text/plain; charset=utf-8', f'{text}\n'.encode())
+
+
+def json_response(data, status: int = 200) -> Response:
+    return Response(status, 'application/json', json.dumps(data, indent=2, default=str).encode())
+
+
+class EncodedExposition(typing.NamedTuple):
+    version: typing.Hashable
+    encoded_at: float
+    body: bytes
+    gzipped: bytes
+
+
+class ExpositionCache:
+    """Encodes a registry once per version and format instead of on every scrape
+
+    version is called on every request, a new version, e.g. a new results snapshot, makes the next
+    request of each format encode the registry again. Each encoding is kept together with a gzip
+    compressed copy, so any number of scrapers get the same bytes until the version changes or the
+    encoding is older than max_age.
+    """
+
+    def __init__(self,
+                 registry: CollectorRegistry,
+                 version: typing.Callable[[], typing.Hashable],
+                 max_age: float = DEFAULT_MAX_AGE) -> None:
+        self.registry = registry
+        self.version = version
+        self.max_age = max_age
+
+        self._encoded: typing.Dict[str, EncodedExposition] = {}
+        self._lock = threading.Lock()
+
+    def get(self, accept: str) -> typing.Tuple[str, EncodedExposition]:
+        encoder, content_type = choose_encoder(accept)
+        version = self.version()
+
+        # concurrent scrapes wait for a single encoding
+        with self._lock:
+            encoded = self._encoded.get(content_type)
+            if encoded is None or encoded.version != version or time.monotonic() - encoded.encoded_at > self.max_age:
+                body = encoder(self.registry)
+                encoded = EncodedExposition(version, time.monotonic(), body, gzip.compress(body, GZIP_LEVEL))
+                self._encoded[content_type] = encoded
+
+        return content_type, encoded
+
+    def response(self, headers: typing.Mapping[str, str]) -> Response:
+        content_type, encoded = self.get(headers.get('Accept', ''))
+        vary = {'Vary': 'Accept, Accept-Encoding'}
+
+        if accepts_gzip(headers.get('Accept-Encoding', '')):
+            return Response(200, content_type, encoded.gzipped, {**vary, 'Content-Encoding': 'gzip'})
+
+        return Response(200, content_type, encoded.body, vary)
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    for coding in accept_encoding.split(','):
+        name, _, params = coding.partition(';')
+        if name.strip().lower() != 'gzip':
+            continue
+
+        # gzip;q=0 explicitly refuses gzip
+        q = params.strip()
+        if not q.startswith('q='):
+            return True
+        try:
+            return float(q[2:]) > 0
+        except ValueError:
+            return False
+
+    return False
+
+
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+    def __init__(self, routes: typing.Dict[str, Route], *args, **kwargs) -> None:
+        # the base class handles the request in its constructor, so routes have to be set first
+        self.routes = routes
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        route = self.routes.get(self.path.split('?', 1)[0])
+        if route is None:
+            self.respond(text_response(404, 'not found'))
+            return
+
+        try:
+            response = route(self.headers)
+        except Exception:
+            logger.exception('handling %s failed', self.path)
+            response = text_response(500, 'internal server error')
+
+        self.respond(response)
+
+    def respond(self, response: Response):
+        self.send_response(response.status)
+        self.send_header('Content-Type', response.content_type)
+        self.send_header('Content-Length', str(len(response.body)))
+        for name, value in response.headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(response.body)
+
+    def log_message(self, format, *args):
+        # scrapes would flood the log
+        pass
+
+
+def start_http_server(port: int, routes: typing.Dict[str, Route]) -> http.server.ThreadingHTTPServer:
+    """Serves routes on port from a daemon thread"""
+    server = http.server.ThreadingHTTPServer(('', port), functools.partial(RequestHandler, routes))
+    server.daemon_threads = True
+
+    threading.Thread(target=server.serve_forever, name='aws-quota-http-server', daemon=True).start()
+    return server
@@ -0,0 +1,121 @@
+import contextlib
+import contextvars
+import dataclasses
+import threading
+import time
+import typing
+
+import boto3
+
+# fixed buckets keep the number of series per histogram constant
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+API_CALL_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+@dataclasses.dataclass(frozen=True)
+class MeasurementKey:
+    key: str
+    service_code: str
+    phase: str
+
+
+class Histogram:
+    def __init__(self, buckets: typing.Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def cumulative_buckets(self) -> typing.List[typing.Tuple[str, int]]:
+        buckets = []
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            buckets.append((str(float(bound)), total))
+        buckets.append(('+Inf', self.count))
+        return buckets
+
+    def copy(self) -> 'Histogram':
+        copy = Histogram(self.buckets)
+        copy.counts = list(self.counts)
+        copy.count = self.count
+        copy.sum = self.sum
+        return copy
+
+
+class Measurement:
+    def __init__(self) -> None:
+        self.api_calls = 0
+        # set once the measured block has finished
+        self.duration = 0.0
+        # a check can make its calls from several fan out threads
+        self._lock = threading.Lock()
+
+    def count_api_call(self):
+        with self._lock:
+            self.api_calls += 1
+
+
+class CheckInstrumentation:
+    """Duration and AWS API call histograms per (check key, service code, phase)
+
+    Checks are measured on the worker thread that executes them, the measurement of the check that is
+    currently running is kept in a context variable, so API calls can be attributed to it from botocore events.
+    Fan out threads of map_concurrently run in a copy of the check's context and count towards it as well.
+    Calls of shared resource collections are attributed to the check that triggered the fetch.
+    """
+
+    def __init__(self) -> None:
+        self.durations: typing.Dict[MeasurementKey, Histogram] = {}
+        self.api_calls: typing.Dict[MeasurementKey, Histogram] = {}
+
+        self._measurement: contextvars.ContextVar[typing.Optional[Measurement]] = contextvars.ContextVar(
+            'aws_quota_measurement', default=None)
+        self._lock = threading.Lock()
+
+    def install(self, session: boto3.Session):
+        """Count the API calls of every client that gets created from session afterwards"""
+        session.events.register(
+            'before-call', self._before_call, unique_id='aws-quota-instrumentation-before-call')
+
+    def _before_call(self, **kwargs):
+        measurement = self._measurement.get()
+        if measurement is not None:
+            measurement.count_api_call()
+
+    @contextlib.contextmanager
+    def measure(self, key: str, service_code: str, phase: str):
+        measurement = Measurement()
+        token = self._measurement.set(measurement)
+
+        start = time.perf_counter()
+        try:
+            yield measurement
+        finally:
+            measurement.duration = time.perf_counter() - start
+            self._measurement.reset(token)
+            self.observe(MeasurementKey(key, service_code, phase), measurement.duration, measurement.api_calls)
+
+    def observe(self, key: MeasurementKey, duration: float, api_calls: int):
+        with self._lock:
+            if key not in self.durations:
+                self.durations[key] = Histogram(DURATION_BUCKETS)
+                self.api_calls[key] = Histogram(API_CALL_BUCKETS)
+
+            self.durations[key].observe(duration)
+            self.api_calls[key].observe(api_calls)
+
+    def samples(self) -> typing.List[typing.Tuple[MeasurementKey, Histogram, Histogram]]:
+        with self._lock:
+            return [
+                (key, self.durations[key].copy(), self.api_calls[key].copy())
+                for key in self.durations
+            ]
@@ -0,0 +1,92 @@
+import collections
+import dataclasses
+import functools
+import logging
+import threading
+import time
+import typing
+
+from cachetools.keys import hashkey
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class CollectionStats:
+    fetches: int = 0
+    fetch_seconds: float = 0.0
+    last_fetch_seconds: float = 0.0
+
+
+class Inventory:
+    """Resource collections that are shared by all checks of the same generation
+
+    A collection is fetched at most once per generation and (session, arguments), concurrent callers
+    wait for the first fetch instead of issuing their own. The exporter's currents job advances the
+    generation every --min-currents-check-interval seconds, so a collection is at most that old and
+    checks refreshed within the same interval see the same version of it.
+    """
+
+    def __init__(self) -> None:
+        self.generation = 0
+        self.generation_started = time.time()
+        self.stats: typing.Dict[str, CollectionStats] = collections.defaultdict(CollectionStats)
+
+        self._entries = {}
+        self._locks = collections.defaultdict(threading.Lock)
+        self._lock = threading.Lock()
+
+    @property
+    def generation_age(self) -> float:
+        return time.time() - self.generation_started
+
+    def advance(self):
+        with self._lock:
+            self.generation += 1
+            self.generation_started = time.time()
+            self._entries.clear()
+            self._locks.clear()
+
+        logger.debug('advanced inventory to generation %d', self.generation)
+
+    def collection(self, fn: typing.Callable) -> typing.Callable:
+        name = f'{fn.__module__.rsplit(".", 1)[-1]}.{fn.__qualname__}'
+
+        @functools.wraps(fn)
+        def wrapper(*args):
+            return self.get(name, fn, *args)
+
+        return wrapper
+
+    def get(self, name: str, fn: typing.Callable, *args):
+        key = hashkey(name, *args)
+
+        with self._lock:
+            generation = self.generation
+            if key in self._entries:
+                return self._entries[key]
+            lock = self._locks[key]
+
+        with lock:
+            with self._lock:
+                if generation == self.generation and key in self._entries:
+                    return self._entries[key]
+
+            start = time.perf_counter()
+            value = fn(*args)
+            duration = time.perf_counter() - start
+
+            with self._lock:
+                stats = self.stats[name]
+                stats.fetches += 1
+                stats.fetch_seconds += duration
+                stats.last_fetch_seconds = duration
+
+                # the generation may have advanced during the fetch, don't mix it into the new one
+                if generation == self.generation:
+                    self._entries[key] = value
+
+        return value
+
+
+INVENTORY = Inventory()
@@ -0,0 +1,91 @@
+import logging
+import typing
+
+import boto3
+import botocore.credentials
+import botocore.session
+
+from aws_quota.utils import get_paginated_results, session_lock, set_account_id
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROLE_SESSION_NAME = 'aws-quota-checker'
+
+
+def list_organization_accounts(session: boto3.Session) -> typing.List[str]:
+    """IDs of all active accounts of the organization session belongs to"""
+    return [
+        account['Id']
+        for account in get_paginated_results(session, 'organizations', 'list_accounts', 'Accounts')
+        if account['Status'] == 'ACTIVE'
+    ]
+
+
+def read_accounts_file(path: str) -> typing.List[str]:
+    """Reads one account ID per line, empty lines and lines starting with # are ignored"""
+    with open(path) as accounts_file:
+        return [
+            line.strip()
+            for line in accounts_file
+            if line.strip() and not line.strip().startswith('#')
+        ]
+
+
+def assume_role_credentials(source_session: boto3.Session,
+                            role_arn: str,
+                            role_session_name: str = DEFAULT_ROLE_SESSION_NAME,
+                            external_id: str = None) -> botocore.credentials.Credentials:
+    """
+    Credentials of role_arn that are fetched on first use and refreshed by botocore before they expire.
+    Share them between all sessions of the same account, so the role is only assumed once.
+    """
+    extra_args = {'RoleSessionName': role_session_name}
+    if external_id is not None:
+        extra_args['ExternalId'] = external_id
+
+    def create_client(*args, **kwargs):
+        # credentials of all accounts are refreshed from worker threads, but share the source session
+        with session_lock(source_session):
+            return source_session._session.create_client(*args, **kwargs)
+
+    fetcher = botocore.credentials.AssumeRoleCredentialFetcher(
+        client_creator=create_client,
+        source_credentials=source_session.get_credentials(),
+        role_arn=role_arn,
+        extra_args=extra_args,
+    )
+
+    return botocore.credentials.DeferredRefreshableCredentials(
+        refresh_using=fetcher.fetch_credentials,
+        method='assume-role'
+    )
+
+
+def create_account_sessions(source_session: boto3.Session,
+                            account_id: str,
+                            role_name: str,
+                            regions: typing.List[str],
+                            role_session_name: str = DEFAULT_ROLE_SESSION_NAME,
+                            external_id: str = None) -> typing.List[boto3.Session]:
+    """One session per region that assumes role_name in account_id
+
+    All sessions share the data loader of source_session, so service models are only loaded and kept once
+    instead of once per account and region.
+    """
+    partition = source_session.get_partition_for_region(source_session.region_name or 'us-east-1')
+    role_arn = f'arn:{partition}:iam::{account_id}:role/{role_name}'
+    credentials = assume_role_credentials(source_session, role_arn, role_session_name, external_id)
+    data_loader = source_session._session.get_component('data_loader')
+
+    sessions = []
+    for region in regions or [source_session.region_name]:
+        botocore_session = botocore.session.Session()
+        botocore_session.register_component('data_loader', data_loader)
+        botocore_session._credentials = credentials
+
+        session = boto3.Session(botocore_session=botocore_session, region_name=region)
+        set_account_id(session, account_id)
+        sessions.append(session)
+
+    logger.debug('created sessions for %s in %s', role_arn, ', '.join(str(session.region_name) for session in sessions))
+    return sessions
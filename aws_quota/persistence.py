@@ -0,0 +1,72 @@
+import json
+import logging
+import sqlite3
+import typing
+
+from aws_quota.results import Result, ResultsSnapshot, SeriesKey
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS documentation (
+    name TEXT PRIMARY KEY,
+    documentation TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL NOT NULL,
+    timestamp REAL NOT NULL,
+    source TEXT NOT NULL
+);
+'''
+
+
+class SnapshotFile:
+    """Keeps the latest results snapshot in a SQLite database, so a restarted exporter can serve it right away
+
+    Every save replaces the previous snapshot in a single transaction, a crash while saving leaves the
+    previous one intact.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path)
+        connection.executescript(SCHEMA)
+        return connection
+
+    def save(self, snapshot: ResultsSnapshot):
+        connection = self.connect()
+        try:
+            with connection:
+                connection.execute('DELETE FROM documentation')
+                connection.execute('DELETE FROM results')
+                connection.executemany(
+                    'INSERT INTO documentation VALUES (?, ?)', snapshot.documentation.items())
+                connection.executemany(
+                    'INSERT INTO results VALUES (?, ?, ?, ?, ?)',
+                    [
+                        (name, json.dumps(labels), result.value, result.timestamp, result.source)
+                        for (name, labels), result in snapshot.results.items()
+                    ]
+                )
+        finally:
+            connection.close()
+
+    def load(self) -> typing.Tuple[typing.Dict[str, str], typing.Dict[SeriesKey, Result]]:
+        """Documentation and results of the saved snapshot, results keep their timestamps and are marked as restored"""
+        connection = self.connect()
+        try:
+            documentation = dict(connection.execute('SELECT name, documentation FROM documentation'))
+            results = {
+                (name, tuple(tuple(pair) for pair in json.loads(labels))): Result(value, timestamp, source, 0, restored=True)
+                for name, labels, value, timestamp, source in connection.execute(
+                    'SELECT name, labels, value, timestamp, source FROM results')
+                if name in documentation
+            }
+        finally:
+            connection.close()
+
+        return documentation, results
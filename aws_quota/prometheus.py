@@ -1,7 +1,9 @@
 import asyncio
+import collections
 from aws_quota.exceptions import InstanceWithIdentifierNotFound, NotImplementedInFavourOfCloudWatch
 from aws_quota.utils import get_account_id, short_exception
 import dataclasses
+import functools
 import logging
 import signal
 import time
@@ -9,12 +11,37 @@ import contextlib
 import typing
 
 from aws_quota.check.quota_check import InstanceQuotaCheck, QuotaCheck
+from aws_quota.executor import CheckExecutor
+from aws_quota.exposition import ExpositionCache, Response, Route, json_response, start_http_server, text_response
+from aws_quota.instrumentation import CheckInstrumentation
+from aws_quota.inventory import INVENTORY, Inventory
+from aws_quota.persistence import SnapshotFile
+from aws_quota.ratelimit import RateLimiter
+from aws_quota.results import ResultsStore, SeriesKey
+from aws_quota.scheduler import CycleStats, RefreshScheduler, jitter, next_deadline
+from aws_quota.status import CheckStatuses
 
 import boto3
 import prometheus_client as prom
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily, Metric
+from prometheus_client.registry import Collector
 
 logger = logging.getLogger(__name__)
 
+# the passes that produce results, each result is evicted once its pass didn't refresh it for too long
+CHECKS_PASS = 'checks'
+LIMITS_PASS = 'limits'
+CURRENTS_PASS = 'currents'
+
+# maximum time in seconds the currents scheduler sleeps, so new checks don't wait for the next due one
+SCHEDULER_TICK = 1.0
+# interval in seconds at which current values refreshed in between passes are published together
+CURRENTS_COMMIT_INTERVAL = 5.0
+# the exporter is considered unhealthy once the currents scheduler didn't run for this many seconds
+LIVENESS_TIMEOUT = 120
+# share of their interval by which passes after the first are shifted, so the jobs don't run in lockstep
+JOB_JITTER = 0.5
+
 
 @dataclasses.dataclass
 class PrometheusExporterSettings:
@@ -24,36 +51,223 @@ class PrometheusExporterSettings:
     get_limits_interval: int
     reload_checks_interval: int
     enable_duration_metrics: bool
+    max_workers: int
+    max_workers_per_service: int
+    service_concurrency: typing.Dict[str, int] = dataclasses.field(default_factory=dict)
+    evict_after_passes: int = 3
+    min_currents_interval: int = 60
+    max_currents_interval: int = 1800
+    utilization_threshold: float = 0.8
+    snapshot_file: str = None
+
+
+class RateLimiterCollector(Collector):
+    def __init__(self, namespace: str, rate_limiter: RateLimiter) -> None:
+        self.namespace = namespace
+        self.rate_limiter = rate_limiter
+
+    def collect(self):
+        labelnames = ['account', 'region', 'service']
+        rate = GaugeMetricFamily(
+            f'{self.namespace}_rate_limit_requests_per_second',
+            'Currently allowed AWS API request rate', labels=labelnames)
+        max_rate = GaugeMetricFamily(
+            f'{self.namespace}_rate_limit_max_requests_per_second',
+            'Configured AWS API request rate', labels=labelnames)
+        requests = CounterMetricFamily(
+            f'{self.namespace}_rate_limit_requests',
+            'Number of rate limited AWS API requests', labels=labelnames)
+        throttles = CounterMetricFamily(
+            f'{self.namespace}_rate_limit_throttled_requests',
+            'Number of AWS API requests that got throttled', labels=labelnames)
+        wait = CounterMetricFamily(
+            f'{self.namespace}_rate_limit_wait_seconds',
+            'Time spent waiting for the rate limiter', labels=labelnames)
+
+        for key, bucket in list(self.rate_limiter.buckets.items()):
+            labels = [key.account, key.region, key.service]
+            rate.add_metric(labels, bucket.rate)
+            max_rate.add_metric(labels, bucket.max_rate)
+            requests.add_metric(labels, bucket.requests)
+            throttles.add_metric(labels, bucket.throttles)
+            wait.add_metric(labels, bucket.wait_seconds)
+
+        yield from (rate, max_rate, requests, throttles, wait)
+
+
+class InventoryCollector(Collector):
+    def __init__(self, namespace: str, inventory: Inventory) -> None:
+        self.namespace = namespace
+        self.inventory = inventory
+
+    def collect(self):
+        yield GaugeMetricFamily(
+            f'{self.namespace}_inventory_generation',
+            'Current resource inventory generation', value=self.inventory.generation)
+        yield GaugeMetricFamily(
+            f'{self.namespace}_inventory_generation_age_seconds',
+            'Time since the current resource inventory generation started', value=self.inventory.generation_age)
+
+        fetches = CounterMetricFamily(
+            f'{self.namespace}_inventory_fetches',
+            'Number of resource collection fetches', labels=['collection'])
+        fetch_seconds = CounterMetricFamily(
+            f'{self.namespace}_inventory_fetch_seconds',
+            'Time spent fetching resource collections', labels=['collection'])
+        last_fetch_seconds = GaugeMetricFamily(
+            f'{self.namespace}_inventory_last_fetch_duration_seconds',
+            'Duration of the last fetch of resource collections', labels=['collection'])
+
+        for name, stats in list(self.inventory.stats.items()):
+            fetches.add_metric([name], stats.fetches)
+            fetch_seconds.add_metric([name], stats.fetch_seconds)
+            last_fetch_seconds.add_metric([name], stats.last_fetch_seconds)
+
+        yield from (fetches, fetch_seconds, last_fetch_seconds)
+
+
+class CheckInstrumentationCollector(Collector):
+    def __init__(self, namespace: str, instrumentation: CheckInstrumentation) -> None:
+        self.namespace = namespace
+        self.instrumentation = instrumentation
+
+    def collect(self):
+        labelnames = ['quota', 'service_code', 'phase']
+        durations = HistogramMetricFamily(
+            f'{self.namespace}_check_duration_seconds',
+            'Time to execute a quota check', labels=labelnames)
+        api_calls = HistogramMetricFamily(
+            f'{self.namespace}_check_api_calls',
+            'Number of AWS API calls of a quota check execution', labels=labelnames)
+
+        for key, duration, calls in self.instrumentation.samples():
+            labels = [key.key, key.service_code, key.phase]
+            durations.add_metric(labels, duration.cumulative_buckets(), duration.sum)
+            api_calls.add_metric(labels, calls.cumulative_buckets(), calls.sum)
+
+        yield from (durations, api_calls)
+
+
+class CycleCollector(Collector):
+    def __init__(self, namespace: str, cycle_stats: CycleStats) -> None:
+        self.namespace = namespace
+        self.cycle_stats = cycle_stats
+
+    def collect(self):
+        cycles = CounterMetricFamily(
+            f'{self.namespace}_cycles',
+            'Number of started cycles, passes for the checks and limits job and check refreshes for the currents job', labels=['job'])
+        overruns = CounterMetricFamily(
+            f'{self.namespace}_cycle_overruns',
+            'Number of cycles that took longer than their interval', labels=['job'])
+        lag = HistogramMetricFamily(
+            f'{self.namespace}_cycle_lag_seconds',
+            'Time between the deadline of a cycle and its start', labels=['job'])
+
+        for job, started, overrun, histogram in self.cycle_stats.samples():
+            cycles.add_metric([job], started)
+            overruns.add_metric([job], overrun)
+            lag.add_metric([job], histogram.cumulative_buckets(), histogram.sum)
+
+        yield from (cycles, overruns, lag)
+
+
+class SnapshotCollector(Collector):
+    """Renders the current results snapshot, scrapes never wait for checks that are being refreshed"""
+
+    def __init__(self, namespace: str, store: ResultsStore) -> None:
+        self.namespace = namespace
+        self.store = store
+
+    def collect(self):
+        snapshot = self.store.snapshot
+        families: typing.Dict[str, Metric] = {}
+
+        for (name, labels), result in snapshot.results.items():
+            if name not in families:
+                families[name] = Metric(name, snapshot.documentation[name], 'gauge')
+            families[name].add_sample(
+                name, dict(labels), result.value, timestamp=result.timestamp if result.restored else None)
+
+        evicted = GaugeMetricFamily(
+            f'{self.namespace}_evicted_series',
+            'Number of series evicted because they were not refreshed anymore (stale) or their check was dropped (dropped)',
+            labels=['reason'])
+        for reason in ('stale', 'dropped'):
+            evicted.add_metric([reason], snapshot.evicted.get(reason, 0))
+
+        return [*families.values(), evicted]
 
 
 class PrometheusExporter:
     def __init__(self,
-                 session: boto3.Session,
+                 sessions: typing.List[boto3.Session],
                  check_classes: typing.List[QuotaCheck],
-                 settings: PrometheusExporterSettings):
-        self.session = session
+                 settings: PrometheusExporterSettings,
+                 rate_limiter: RateLimiter = None):
+        # one session per region, global checks only run in the first one
+        self.sessions = sessions
         self.check_classes = check_classes
         self.checks = []
         self.settings = settings
+        self.executor = CheckExecutor(
+            settings.max_workers,
+            settings.max_workers_per_service,
+            settings.service_concurrency
+        )
 
-        # unregister default collectors
-        for name in list(prom.REGISTRY._names_to_collectors.values()):
-            with contextlib.suppress(KeyError):
-                prom.REGISTRY.unregister(name)
-
-        prom.Info(f'{self.settings.namespace}', 'AWS quota checker info').info({
+        self.results = ResultsStore(settings.evict_after_passes)
+        self.snapshot_file = SnapshotFile(settings.snapshot_file) if settings.snapshot_file else None
+        self.snapshot_file_lock = asyncio.Lock()
+
+        self.statuses = CheckStatuses()
+        # ready once limits and current values of all checks have been refreshed, or results have been restored
+        self.ready = False
+        self.limits_refreshed = False
+        self.heartbeat = time.monotonic()
+
+        if self.snapshot_file is not None:
+            self.restore_snapshot()
+        self.scheduler = RefreshScheduler(
+            settings.min_currents_interval,
+            settings.max_currents_interval,
+            settings.get_currents_interval,
+            settings.utilization_threshold
+        )
+        # last known values of each check, the scheduler refreshes checks close to their limit more often
+        self.currents: typing.Dict[QuotaCheck, float] = {}
+        self.maximums: typing.Dict[QuotaCheck, float] = {}
+        # keys of the current value and limit series of each check, resolved once per check
+        self.series: typing.Dict[QuotaCheck, typing.Tuple[SeriesKey, SeriesKey]] = {}
+        self.instrumentation = CheckInstrumentation()
+        self.cycle_stats = CycleStats()
+        for session in sessions:
+            self.instrumentation.install(session)
+
+        # a private registry doesn't contain the default process and platform collectors
+        self.registry = prom.CollectorRegistry(auto_describe=False)
+
+        prom.Info(f'{self.settings.namespace}', 'AWS quota checker info', registry=self.registry).info({
             **self.default_labels
         })
 
-    @property
+        self.registry.register(SnapshotCollector(self.settings.namespace, self.results))
+        self.registry.register(InventoryCollector(self.settings.namespace, INVENTORY))
+        self.registry.register(CycleCollector(self.settings.namespace, self.cycle_stats))
+        if settings.enable_duration_metrics:
+            self.registry.register(CheckInstrumentationCollector(self.settings.namespace, self.instrumentation))
+        if rate_limiter is not None:
+            self.registry.register(RateLimiterCollector(self.settings.namespace, rate_limiter))
+
+    @functools.cached_property
     def default_labels(self):
         return {
-            'account': get_account_id(self.session),
-            'region': self.session.region_name
+            'account': get_account_id(self.sessions[0]),
+            'region': ','.join(str(session.region_name) for session in self.sessions)
         }
 
     @contextlib.contextmanager
-    def timeit_gauge(self, prefix: str, labels: dict = None, **kwargs):
+    def timeit_gauge(self, prefix: str, documentation: str, source: str, labels: dict = None):
         if labels is None:
             labels = self.default_labels
 
@@ -64,150 +278,495 @@ class PrometheusExporter:
             duration = time.time() - start
 
             if self.settings.enable_duration_metrics:
-                PrometheusExporter.get_or_create_gauge(
-                    name=f'{prefix}_duration_seconds',
-                    labelnames=labels.keys(),
-                    **kwargs).labels(**labels).set(duration)
+                self.results.set(f'{prefix}_duration_seconds', documentation, labels, duration, source)
+
+    def restore_snapshot(self):
+        try:
+            documentation, results = self.snapshot_file.load()
+        except Exception as e:
+            logger.error('restoring results from %s failed (%s)', self.snapshot_file.path, short_exception(e))
+            return
+
+        self.results.restore(documentation, results)
+        self.ready = bool(results)
+        logger.info('restored %d results from %s', len(results), self.snapshot_file.path)
+
+    async def commit(self, source: str = None):
+        """Publishes pending results, the snapshot is saved after every pass of source"""
+        self.results.commit(source)
+
+        if source is None or self.snapshot_file is None:
+            return
+
+        # saves of different jobs don't overlap, each one writes the latest snapshot
+        async with self.snapshot_file_lock:
+            try:
+                await asyncio.to_thread(self.snapshot_file.save, self.results.snapshot)
+            except Exception as e:
+                logger.error('saving results to %s failed (%s)', self.snapshot_file.path, short_exception(e))
+
+    def drop_obsolete_check(self, check: QuotaCheck):
+        """Removes all series of check with the next snapshot instead of waiting for them to become stale"""
+        self.results.discard(check.labels)
+        self.currents.pop(check, None)
+        self.maximums.pop(check, None)
+        self.series.pop(check, None)
+        self.statuses.drop(check)
+
+    def series_keys(self, check: QuotaCheck) -> typing.Tuple[SeriesKey, SeriesKey]:
+        """Keys of the current value and the limit series of check"""
+        keys = self.series.get(check)
+        if keys is None:
+            name = f'{self.settings.namespace}_{check.key}'
+            keys = self.series[check] = ((name, check.labels), (f'{name}_limit', check.labels))
+
+        return keys
+
+    def drop_checks(self, checks_to_drop: typing.List[QuotaCheck]):
+        if checks_to_drop:
+            self.checks = [check for check in self.checks if check not in checks_to_drop]
+
+            for check in checks_to_drop:
+                self.drop_obsolete_check(check)
+
+    async def submit(self, service: str, fn: typing.Callable, *args, delay: float = 0.0):
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return await asyncio.wrap_future(self.executor.submit(service, fn, *args))
+
+    def collect_identifiers(self, chk, session: boto3.Session) -> typing.List:
+        """Identifiers of all instances of chk, checks without instances have a single None identifier"""
+        if issubclass(chk, InstanceQuotaCheck):
+            with self.instrumentation.measure(chk.key, chk.service_code, CHECKS_PASS):
+                return chk.get_all_identifiers(session)
+
+        return [None]
 
     @staticmethod
-    def get_or_create_gauge(name, **kwargs) -> prom.Gauge:
-        if name in prom.REGISTRY._names_to_collectors:
-            return prom.REGISTRY._names_to_collectors[name]
+    def check_identity(chk, session: boto3.Session, identifier) -> typing.Hashable:
+        # some instance identifiers are dicts of labels
+        if isinstance(identifier, dict):
+            identifier = tuple(sorted(identifier.items()))
 
-        return prom.Gauge(name, **kwargs)
+        return chk, session, identifier
 
-    def drop_obsolete_check(self):
-        raise NotImplementedError
+    @staticmethod
+    def create_check(chk, session: boto3.Session, identifier) -> QuotaCheck:
+        if issubclass(chk, InstanceQuotaCheck):
+            return chk(session, identifier)
+
+        return chk(session)
+
+    async def load_checks(self):
+        with self.timeit_gauge(
+            f'{self.settings.namespace}_collect_checks',
+            documentation='Time to collect all quota checks',
+            source=CHECKS_PASS
+        ):
+            logger.info('collecting checks')
+            collections_to_run = [
+                (chk, session) for chk in self.check_classes for session in chk.sessions_to_check(self.sessions)
+            ]
+            results = await asyncio.gather(
+                *[self.submit(chk.service_code, self.collect_identifiers, chk, session) for chk, session in collections_to_run],
+                return_exceptions=True
+            )
+
+            live_checks = collections.defaultdict(dict)
+            for check in self.checks:
+                identity = self.check_identity(type(check), check.boto_session, getattr(check, 'instance_id', None))
+                live_checks[(type(check), check.boto_session)][identity] = check
+
+            checks = []
+            added = []
+            removed = []
+            for (chk, session), result in zip(collections_to_run, results):
+                existing = live_checks[(chk, session)]
+
+                if isinstance(result, Exception):
+                    # keep checking the instances we know of until they can be collected again
+                    logger.error('failed to collect check %s in %s (%s)', chk, session.region_name, short_exception(result))
+                    checks.extend(existing.values())
+                    continue
+
+                identities = set()
+                for identifier in result:
+                    identity = self.check_identity(chk, session, identifier)
+                    identities.add(identity)
+
+                    if identity in existing:
+                        checks.append(existing[identity])
+                    else:
+                        check = self.create_check(chk, session, identifier)
+                        checks.append(check)
+                        added.append(check)
+
+                removed.extend(check for identity, check in existing.items() if identity not in identities)
+
+            for check in removed:
+                self.drop_obsolete_check(check)
+
+            self.results.set(f'{self.settings.namespace}_check_count', 'Number of AWS Quota Checks', {}, len(checks), CHECKS_PASS)
+            self.results.set(f'{self.settings.namespace}_checks_added', 'Number of checks added by the last reload', {}, len(added), CHECKS_PASS)
+            self.results.set(f'{self.settings.namespace}_checks_removed', 'Number of checks removed by the last reload', {}, len(removed), CHECKS_PASS)
+            self.checks = checks
+            self.checks_loaded.set()
+            logger.info(f'collected {len(checks)} checks, {len(added)} added, {len(removed)} removed')
+
+        await self.commit(CHECKS_PASS)
 
     async def load_checks_job(self):
-        g = PrometheusExporter.get_or_create_gauge(
-            f'{self.settings.namespace}_check_count',
-            documentation='Number of AWS Quota Checks'
-        )
+        await self.run_fixed_rate(CHECKS_PASS, self.settings.reload_checks_interval, self.load_checks)
 
-        while True:
-            with self.timeit_gauge(
-                f'{self.settings.namespace}_collect_checks',
-                documentation='Time to collect all quota checks'
-            ):
-                logger.info('collecting checks')
-                checks = []
-                for chk in self.check_classes:
-                    try:
-                        if issubclass(chk, InstanceQuotaCheck):
-                            for identifier in chk.get_all_identifiers(self.session):
-                                checks.append(
-                                    chk(self.session, identifier)
-                                )
-                        else:
-                            checks.append(chk(self.session))
-                    except Exception as e:
-                        logger.error('failed to collect check %s (%s)', chk, short_exception(e))
-
-                g.set(len(checks))
-                self.checks = checks
-                logger.info(f'collected {len(checks)} checks')
-            await asyncio.sleep(self.settings.reload_checks_interval)
+    def refresh_limit(self, check: QuotaCheck) -> typing.List[QuotaCheck]:
+        _, limit_series = self.series_keys(check)
 
-    async def get_limits_job(self):
+        try:
+            with self.instrumentation.measure(check.key, check.service_code, LIMITS_PASS) as measurement:
+                value = check.maximum
+
+            self.results.set_series(limit_series, f'{check.description} Limit', value, LIMITS_PASS)
+            self.maximums[check] = value
+            self.statuses.record(check, LIMITS_PASS, measurement.duration)
+        except InstanceWithIdentifierNotFound as e:
+            logger.warn(
+                'instance with identifier %s does not exist anymore, dropping it...', e.check.instance_id)
+            return [check]
+        except Exception as e:
+            logger.error(
+                'getting maximum of quota %s failed (%s)', check, short_exception(e))
+            self.statuses.record(check, LIMITS_PASS, measurement.duration, e)
+
+        return []
+
+    def set_current(self, check: QuotaCheck, value):
+        current_series, _ = self.series_keys(check)
+        self.results.set_series(current_series, check.description, value, CURRENTS_PASS)
+        self.currents[check] = value
+
+    def refresh_current(self, check: QuotaCheck) -> typing.List[QuotaCheck]:
+        try:
+            with self.instrumentation.measure(check.key, check.service_code, CURRENTS_PASS) as measurement:
+                value = check.current
+
+            self.set_current(check, value)
+            self.statuses.record(check, CURRENTS_PASS, measurement.duration)
+        except InstanceWithIdentifierNotFound as e:
+            logger.warn(
+                'instance with identifier %s does not exist anymore, dropping it...', e.check.instance_id)
+            return [check]
+        except NotImplementedInFavourOfCloudWatch as e:
+            logger.debug('(%s) not implemented, use CloudWatch metric instead', check)
+            self.statuses.record(check, CURRENTS_PASS, measurement.duration)
+        except Exception as e:
+            logger.error(
+                'getting current value of quota %s failed (%s)', check, short_exception(e))
+            self.statuses.record(check, CURRENTS_PASS, measurement.duration, e)
+
+        return []
+
+    def refresh_batch_current(self,
+                              check_class: typing.Type[InstanceQuotaCheck],
+                              session: boto3.Session,
+                              checks: typing.List[InstanceQuotaCheck]) -> typing.List[QuotaCheck]:
+        try:
+            with self.instrumentation.measure(check_class.key, check_class.service_code, CURRENTS_PASS) as measurement:
+                values = check_class.batch_current(session)
+        except Exception as e:
+            logger.error(
+                'getting current values of quota %s failed (%s)', check_class.key, short_exception(e))
+            for check in checks:
+                self.statuses.record(check, CURRENTS_PASS, measurement.duration, e)
+            return []
+
+        checks_to_drop = []
+        for check in checks:
+            if check.instance_id not in values:
+                logger.warn(
+                    'instance with identifier %s does not exist anymore, dropping it...', check.instance_id)
+                checks_to_drop.append(check)
+            else:
+                self.set_current(check, values[check.instance_id])
+                self.statuses.record(check, CURRENTS_PASS, measurement.duration)
+
+        return checks_to_drop
+
+    async def refresh_checks(self,
+                             refresh: typing.Callable[[QuotaCheck], typing.List[QuotaCheck]],
+                             batch_refresh: typing.Callable[..., typing.List[QuotaCheck]] = None,
+                             checks_to_refresh: typing.List[QuotaCheck] = None,
+                             spread: float = 0.0):
+        """Refreshes all checks, or only checks_to_refresh, with refresh, checks that support it are refreshed per class with batch_refresh
+
+        With spread, every check or batch starts after its own random delay of up to spread seconds.
+        """
+        tasks = []
+        task_checks = []
+        batches = collections.defaultdict(list)
+
+        if checks_to_refresh is None:
+            checks_to_refresh = list(self.checks)
+
+        for check in checks_to_refresh:
+            if batch_refresh is not None and self.is_batched(check):
+                batches[(type(check), check.boto_session)].append(check)
+            else:
+                tasks.append(self.submit(check.service_code, refresh, check, delay=jitter(spread)))
+                task_checks.append([check])
+
+        for (check_class, session), checks in batches.items():
+            tasks.append(self.submit(check_class.service_code, batch_refresh, check_class, session, checks, delay=jitter(spread)))
+            task_checks.append(checks)
+
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        checks_to_drop = []
+        for checks, result in zip(task_checks, results):
+            if isinstance(result, Exception):
+                logger.error('refreshing quota %s failed (%s)', checks[0], short_exception(result))
+            else:
+                checks_to_drop.extend(result)
+
+        self.drop_checks(checks_to_drop)
+
+    async def run_fixed_rate(self, job: str, interval: float, run_pass: typing.Callable[[], typing.Awaitable]):
+        """Runs run_pass every interval seconds, measured from the deadline of the previous pass instead of its end
+
+        The first pass runs immediately, the following ones are shifted by a random part of the interval.
+        """
+        deadline = time.monotonic()
+        offset = jitter(interval * JOB_JITTER)
 
         while True:
-            with self.timeit_gauge(
-                f'{self.settings.namespace}_check_limits',
-                documentation='Time to check limits of all quotas'
-            ):
-                logger.info('refreshing limits')
-                checks_to_drop = []
-
-                for check in self.checks:
-                    labels = check.label_values
-                    name = f'{self.settings.namespace}_{check.key}_limit'
-
-                    try:
-                        with self.timeit_gauge(
-                            name,
-                            documentation=f'Time to collect {check.description} Limit',
-                            labels=self.default_labels | labels
-                        ):
-                            value = check.maximum
-
-                        PrometheusExporter.get_or_create_gauge(
-                            name,
-                            documentation=f'{check.description} Limit',
-                            labelnames=labels.keys()
-                        ).labels(**check.label_values).set(value)
-                    except InstanceWithIdentifierNotFound as e:
-                        logger.warn(
-                            'instance with identifier %s does not exist anymore, dropping it...', e.check.instance_id)
-                        checks_to_drop.append(e.check)
-                    except Exception as e:
-                        logger.error(
-                            'getting maximum of quota %s failed (%s)', check, short_exception(e))
-
-                for check in checks_to_drop:
-                    self.checks.remove(check)
-
-            logger.info('limits refreshed')
-            await asyncio.sleep(self.settings.get_limits_interval)
+            started = time.monotonic()
+            self.cycle_stats.started(job, started - deadline)
+            await run_pass()
+
+            deadline = next_deadline(deadline, started, interval) + offset
+            offset = 0
+
+            now = time.monotonic()
+            if now > deadline:
+                logger.warning('%s pass took %.0fs longer than its interval of %ds', job, now - deadline, interval)
+                self.cycle_stats.overrun(job)
+
+            await asyncio.sleep(max(0.0, deadline - now))
+
+    @staticmethod
+    def is_batched(check: QuotaCheck) -> bool:
+        return isinstance(check, InstanceQuotaCheck) and check.supports_batch_current()
+
+    def refresh_unit(self, check: QuotaCheck) -> typing.Hashable:
+        """What the scheduler refreshes check with, batched checks share one unit per class and session"""
+        return (type(check), check.boto_session) if self.is_batched(check) else check
+
+    def refresh_units(self) -> typing.Dict[typing.Hashable, typing.List[QuotaCheck]]:
+        units = collections.defaultdict(list)
+        for check in self.checks:
+            units[self.refresh_unit(check)].append(check)
+
+        return units
+
+    def utilization(self, checks: typing.List[QuotaCheck]) -> typing.Optional[float]:
+        """Highest utilization of checks, None if it isn't known for any of them yet"""
+        utilizations = [
+            self.currents[check] / self.maximums[check]
+            for check in checks
+            if check in self.currents and self.maximums.get(check)
+        ]
+
+        return max(utilizations) if utilizations else None
+
+    async def refresh_due_units(self,
+                                due: typing.List[typing.Tuple[typing.Hashable, float]],
+                                units: typing.Dict[typing.Hashable, typing.List[QuotaCheck]],
+                                in_flight: typing.Set[typing.Hashable]):
+        started = time.monotonic()
+        for _, deadline in due:
+            self.cycle_stats.started(CURRENTS_PASS, started - deadline)
+
+        with self.timeit_gauge(
+            f'{self.settings.namespace}_check_currents',
+            documentation='Time to check current values of the quotas that were due',
+            source=CURRENTS_PASS
+        ):
+            logger.debug('refreshing current values of %d checks', len(due))
+            await self.refresh_checks(
+                self.refresh_current, self.refresh_batch_current, [check for unit, _ in due for check in units[unit]])
+
+        now = time.monotonic()
+        live_units = self.refresh_units()
+        for unit, deadline in due:
+            in_flight.discard(unit)
+            if unit not in live_units:
+                continue
+
+            deadline = next_deadline(deadline, started, self.scheduler.interval(self.utilization(live_units[unit])))
+            if now > deadline:
+                self.cycle_stats.overrun(CURRENTS_PASS)
+            self.scheduler.schedule(unit, deadline)
+
+    async def refresh_limits(self):
+        with self.timeit_gauge(
+            f'{self.settings.namespace}_check_limits',
+            documentation='Time to check limits of all quotas',
+            source=LIMITS_PASS
+        ):
+            logger.info('refreshing limits')
+            # the first pass is spread like the first refresh of the current values, so a cold start
+            # doesn't hit service quotas with every check at once
+            spread = 0.0 if self.limits_refreshed else self.settings.min_currents_interval
+            await self.refresh_checks(self.refresh_limit, spread=spread)
+
+        await self.commit(LIMITS_PASS)
+        self.limits_refreshed = True
+        logger.info('limits refreshed')
+
+    async def get_limits_job(self):
+        await self.checks_loaded.wait()
+        await self.run_fixed_rate(LIMITS_PASS, self.settings.get_limits_interval, self.refresh_limits)
 
     async def get_currents_job(self):
+        await self.checks_loaded.wait()
+
+        tasks = set()
+        in_flight = set()
+        checks = units = None
+        last_advance = last_generation = last_commit = time.monotonic()
 
         while True:
-            with self.timeit_gauge(
-                f'{self.settings.namespace}_check_currents',
-                documentation='Time to check limits of all quotas'
-            ):
-
-                logger.info('refreshing current values')
-                checks_to_drop = []
-                for check in self.checks:
-                    labels = check.label_values
-                    name = f'{self.settings.namespace}_{check.key}'
-
-                    try:
-                        with self.timeit_gauge(
-                            name,
-                            documentation=f'Time to collect {check.description}',
-                            labels=self.default_labels | labels
-                        ):
-                            value = check.current
-
-                        PrometheusExporter.get_or_create_gauge(
-                            name,
-                            documentation=check.description,
-                            labelnames=labels.keys()
-                        ).labels(**check.label_values).set(value)
-                    except InstanceWithIdentifierNotFound as e:
-                        logger.warn(
-                            'instance with identifier %s does not exist anymore, dropping it...', e.check.instance_id)
-                        checks_to_drop.append(e.check)
-                    except NotImplementedInFavourOfCloudWatch as e:
-                        logger.debug('(%s) not implemented, use CloudWatch metric instead', check)
-                    except Exception as e:
-                        logger.error(
-                            'getting current value of quota %s failed (%s)', check, short_exception(e))
-
-                for check in checks_to_drop:
-                    self.checks.remove(check)
-
-            logger.info('current values refreshed')
-            await asyncio.sleep(self.settings.get_currents_interval)
+            now = time.monotonic()
+            self.heartbeat = now
+
+            # the check list is replaced as a whole on every change, so units only need to be rebuilt then
+            if self.checks is not checks:
+                checks = self.checks
+                units = self.refresh_units()
+
+                # new checks are spread across the min interval instead of all being refreshed at once
+                for unit in units:
+                    if unit not in self.scheduler and unit not in in_flight:
+                        self.scheduler.schedule(unit, now + jitter(self.scheduler.min_interval))
+                for unit in [unit for unit in self.scheduler.units() if unit not in units]:
+                    self.scheduler.unschedule(unit)
+
+            due = self.scheduler.pop_due(now)
+            if due:
+                in_flight.update(unit for unit, _ in due)
+                task = asyncio.create_task(self.refresh_due_units(due, units, in_flight))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            # checks that are due get fresh resource collections at least every min interval
+            if now - last_advance >= self.settings.min_currents_interval:
+                INVENTORY.advance()
+                last_advance = now
+
+            # every check has been refreshed at least once per max interval, which makes it a pass
+            if now - last_generation >= self.scheduler.max_interval:
+                await self.commit(CURRENTS_PASS)
+                logger.info('current values refreshed, %d checks scheduled', len(self.scheduler))
+                last_generation = last_commit = now
+            # values of the units that were due in between are published together instead of after every batch
+            elif now - last_commit >= CURRENTS_COMMIT_INTERVAL:
+                await self.commit()
+                last_commit = now
+
+            next_due = self.scheduler.next_due()
+            await asyncio.sleep(SCHEDULER_TICK if next_due is None else min(SCHEDULER_TICK, max(0.0, next_due - now)))
+
+    def is_ready(self) -> bool:
+        if not self.ready and self.limits_refreshed:
+            checks = self.checks
+            # new checks that are added later don't make the exporter unready again
+            self.ready = all(self.statuses.attempted(check, CURRENTS_PASS) for check in checks)
+
+        return self.ready
+
+    def is_healthy(self) -> bool:
+        # the currents scheduler only starts once the checks have been loaded
+        if not self.limits_refreshed:
+            return True
+
+        return time.monotonic() - self.heartbeat < LIVENESS_TIMEOUT
+
+    def status(self) -> dict:
+        """State of the exporter and its checks, built from memory only"""
+        now = time.monotonic()
+        snapshot = self.results.snapshot
+
+        checks = []
+        for check in list(self.checks):
+            due = self.scheduler.due(self.refresh_unit(check))
+            checks.append({
+                'quota': check.key,
+                'labels': check.label_values,
+                'next_refresh_in_seconds': None if due is None else max(0.0, due - now),
+                **{
+                    phase: dataclasses.asdict(status) if status is not None else None
+                    for phase in (LIMITS_PASS, CURRENTS_PASS)
+                    for status in [self.statuses.get(check, phase)]
+                },
+            })
+
+        return {
+            'ready': self.is_ready(),
+            'healthy': self.is_healthy(),
+            'snapshot_generation': snapshot.generation,
+            'snapshot_created': snapshot.created,
+            'check_count': len(checks),
+            'scheduled_refreshes': len(self.scheduler),
+            'queue_depth': self.executor.queue_depth,
+            'checks': checks,
+        }
+
+    def routes(self) -> typing.Dict[str, Route]:
+        # the exposition is encoded again once a new snapshot has been committed
+        exposition = ExpositionCache(self.registry, lambda: self.results.snapshot.generation)
+        return {
+            '/': exposition.response,
+            '/metrics': exposition.response,
+            '/healthz': self.healthz,
+            '/readyz': self.readyz,
+            '/api/status': lambda headers: json_response(self.status()),
+        }
+
+    def healthz(self, headers) -> Response:
+        if self.is_healthy():
+            return text_response(200, 'ok')
+
+        return text_response(503, f'current values have not been scheduled for more than {LIVENESS_TIMEOUT}s')
+
+    def readyz(self, headers) -> Response:
+        if self.is_ready():
+            return text_response(200, 'ready')
+
+        return text_response(503, 'limits and current values have not been refreshed yet')
 
     def serve(self):
         logger.info(f'starting /metrics endpoint on port {self.settings.port}')
-        prom.start_http_server(self.settings.port)
+        start_http_server(self.settings.port, self.routes())
+
+    async def background_jobs(self, *jobs: typing.Callable[[], typing.Awaitable]):
+        self.checks_loaded = asyncio.Event()
 
-    async def background_jobs(self):
         await asyncio.gather(
             self.load_checks_job(),
             self.get_limits_job(),
             self.get_currents_job(),
+            *[job() for job in jobs],
             return_exceptions=True
         )
 
-    def start(self):
-        self.serve()
+    def run(self, *jobs: typing.Callable[[], typing.Awaitable]):
+        """Runs the background jobs, plus any additional ones, until interrupted"""
         try:
-            asyncio.run(self.background_jobs())
+            asyncio.run(self.background_jobs(*jobs))
         except KeyboardInterrupt:
             logger.info('shutting down...')
+        finally:
+            self.executor.shutdown()
+
+    def start(self):
+        self.serve()
+        self.run()
@@ -0,0 +1,168 @@
+import dataclasses
+import functools
+import logging
+import threading
+import time
+import typing
+
+import boto3
+
+from aws_quota.utils import get_account_id
+
+logger = logging.getLogger(__name__)
+
+# error codes botocore treats as throttling, see botocore.retries.standard.ThrottledRetryableChecker
+THROTTLING_ERROR_CODES = frozenset([
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottledException',
+    'TooManyRequestsException',
+    'ProvisionedThroughputExceededException',
+    'TransactionInProgressException',
+    'RequestLimitExceeded',
+    'BandwidthLimitExceeded',
+    'LimitExceededException',
+    'RequestThrottled',
+    'SlowDown',
+    'PriorRequestNotComplete',
+    'EC2ThrottledException',
+])
+
+# APIs of these services are served by a single global endpoint, no matter which region the client has been created for
+GLOBAL_SERVICES = frozenset(['iam', 'route53', 'organizations', 's3'])
+
+DEFAULT_RATE = 20.0
+
+# known API rate limits that are lower than the default
+# https://docs.aws.amazon.com/Route53/latest/DeveloperGuide/DNSLimitations.html#limits-api-requests
+DEFAULT_SERVICE_RATES = {
+    'route53': 5.0,
+    'service-quotas': 10.0,
+    'iam': 10.0,
+}
+
+
+class AdaptiveTokenBucket:
+    """Token bucket whose refill rate adapts to throttling responses
+
+    The rate is halved whenever a request gets throttled (at most once per second) and grows back
+    by a small fraction of the configured rate with every successful request.
+    """
+
+    backoff_factor: float = 0.5
+    backoff_cooldown: float = 1.0
+    recovery_step: float = 0.02
+    min_rate_factor: float = 0.05
+
+    def __init__(self, rate: float) -> None:
+        self.max_rate = rate
+        self.min_rate = rate * self.min_rate_factor
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+
+        self.requests = 0
+        self.throttles = 0
+        self.wait_seconds = 0.0
+
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._last_backoff = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            self.requests += 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.wait_seconds += wait
+
+        if wait > 0:
+            time.sleep(wait)
+
+    def on_throttle(self):
+        with self._lock:
+            self.throttles += 1
+            now = time.monotonic()
+            if now - self._last_backoff < self.backoff_cooldown:
+                return
+
+            self._refill(now)
+            self._last_backoff = now
+            self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+            self._tokens = min(self._tokens, 0.0)
+
+    def on_success(self):
+        if self.rate >= self.max_rate:
+            return
+
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.max_rate * self.recovery_step)
+
+
+@dataclasses.dataclass(frozen=True)
+class RateLimiterKey:
+    account: str
+    region: str
+    service: str
+
+
+class RateLimiter:
+    """Shares one adaptive token bucket per (account, region, service) between all AWS calls of installed sessions"""
+
+    def __init__(self, default_rate: float = DEFAULT_RATE, service_rates: typing.Dict[str, float] = None) -> None:
+        self.default_rate = default_rate
+        self.service_rates = DEFAULT_SERVICE_RATES | (service_rates or {})
+        self.buckets: typing.Dict[RateLimiterKey, AdaptiveTokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, account: str, region: str, service: str) -> AdaptiveTokenBucket:
+        if service in GLOBAL_SERVICES or region is None:
+            region = 'global'
+
+        key = RateLimiterKey(account, region, service)
+        with self._lock:
+            if key not in self.buckets:
+                self.buckets[key] = AdaptiveTokenBucket(self.service_rates.get(service, self.default_rate))
+            return self.buckets[key]
+
+    def install(self, session: boto3.Session):
+        """Rate limit every client that gets created from session afterwards"""
+        account = get_account_id(session)
+
+        session.events.register(
+            'before-call', functools.partial(self._before_call, account), unique_id='aws-quota-rate-limiter-before-call')
+        session.events.register(
+            'request-created', self._request_created, unique_id='aws-quota-rate-limiter-request-created')
+        session.events.register(
+            'response-received', self._response_received, unique_id='aws-quota-rate-limiter-response-received')
+
+    def _before_call(self, account: str, model, context: dict, **kwargs):
+        context['aws_quota_rate_limit_bucket'] = self.bucket(
+            account, context.get('client_region'), model.service_model.service_name)
+
+    @staticmethod
+    def _request_created(request, **kwargs):
+        # emitted for every attempt, so retries of throttled requests take a token as well.
+        # Handlers of the session run before the client's signer, the request is signed after waiting
+        bucket = request.context.get('aws_quota_rate_limit_bucket')
+        if bucket is not None:
+            bucket.acquire()
+
+    @staticmethod
+    def _response_received(context: dict, parsed_response: dict, response_dict: dict, **kwargs):
+        bucket = context.get('aws_quota_rate_limit_bucket')
+        if bucket is None or response_dict is None:
+            return
+
+        if parsed_response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES:
+            bucket.on_throttle()
+            logger.debug('request got throttled, rate is now %.2f/s', bucket.rate)
+        elif response_dict['status_code'] < 300:
+            bucket.on_success()
@@ -0,0 +1,166 @@
+import collections
+import dataclasses
+import threading
+import time
+import types
+import typing
+
+# label pairs sorted by label name
+Labels = typing.Tuple[typing.Tuple[str, str], ...]
+# metric name and its labels
+SeriesKey = typing.Tuple[str, Labels]
+
+
+def series_key(name: str, labels: typing.Dict[str, str]) -> SeriesKey:
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+@dataclasses.dataclass(frozen=True)
+class Result:
+    value: float
+    timestamp: float
+    # the pass that produced the result and how many of its passes had been completed at that time
+    source: str
+    generation: int
+    # results loaded from a saved snapshot are exposed with their timestamp until they are refreshed
+    restored: bool = False
+
+
+@dataclasses.dataclass(frozen=True)
+class ResultsSnapshot:
+    """Immutable view of all exported results, replaced as a whole by ResultsStore.commit"""
+    generation: int
+    created: float
+    documentation: typing.Mapping[str, str]
+    results: typing.Mapping[SeriesKey, Result]
+    # number of series that have been evicted so far, by reason
+    evicted: typing.Mapping[str, int]
+
+
+EMPTY_SNAPSHOT = ResultsSnapshot(
+    0, 0.0, types.MappingProxyType({}), types.MappingProxyType({}), types.MappingProxyType({}))
+
+
+class ResultsStore:
+    """Collects results of checks and publishes them as immutable snapshots
+
+    Writers only touch a pending batch, readers only ever see a complete snapshot.
+    commit merges the batch into a new snapshot and swaps it in with a single assignment,
+    so reading the snapshot doesn't need a lock.
+
+    Every result is tagged with the generation of the pass that produced it. Results that haven't been
+    refreshed by evict_after passes of their source are evicted, so series of resources that don't
+    exist anymore disappear instead of being exposed forever.
+    """
+
+    def __init__(self, evict_after: int = 3) -> None:
+        self.evict_after = evict_after
+        self.snapshot = EMPTY_SNAPSHOT
+
+        self._generations: typing.Dict[str, int] = collections.Counter()
+        self._evicted: typing.Dict[str, int] = collections.Counter()
+        self._documentation: typing.Dict[str, str] = {}
+        self._pending: typing.Dict[SeriesKey, Result] = {}
+        self._pending_by_labels: typing.Dict[Labels, typing.Set[SeriesKey]] = collections.defaultdict(set)
+        # labels whose published series are evicted with the next commit
+        self._discarded: typing.Set[Labels] = set()
+        # keys of all published series by their labels, so discarding a check doesn't scan every series
+        self._series_by_labels: typing.Dict[Labels, typing.Set[SeriesKey]] = collections.defaultdict(set)
+        self._lock = threading.Lock()
+
+    def restore(self, documentation: typing.Dict[str, str], results: typing.Dict[SeriesKey, Result]):
+        """Publishes results of a previous run, they are evicted like any other result unless they are refreshed"""
+        with self._lock:
+            for name, text in documentation.items():
+                self._documentation.setdefault(name, text)
+
+            merged = dict(results)
+            merged.update(self.snapshot.results)
+            for key in results:
+                self._series_by_labels[key[1]].add(key)
+
+            self.snapshot = ResultsSnapshot(
+                generation=self.snapshot.generation + 1,
+                created=time.time(),
+                documentation=types.MappingProxyType(dict(self._documentation)),
+                results=types.MappingProxyType(merged),
+                evicted=self.snapshot.evicted,
+            )
+
+    def set(self, name: str, documentation: str, labels: typing.Dict[str, str], value: float, source: str):
+        self.set_series(series_key(name, labels), documentation, value, source)
+
+    def set_series(self, key: SeriesKey, documentation: str, value: float, source: str):
+        """Like set, for callers that keep the key of a series instead of building it from a dict every time"""
+        with self._lock:
+            if key[0] not in self._documentation:
+                self._documentation[key[0]] = documentation
+            self._pending[key] = Result(float(value), time.time(), source, self._generations[source])
+            self._pending_by_labels[key[1]].add(key)
+
+    def discard(self, labels: Labels):
+        """Evicts all series with exactly these labels that have been set so far
+
+        Pending results are dropped right away, published ones with the next commit. Results that are set
+        afterwards, e.g. by a check that has been created again with the same labels, are kept.
+        """
+        with self._lock:
+            for key in self._pending_by_labels.pop(labels, ()):
+                del self._pending[key]
+            self._discarded.add(labels)
+
+    def is_stale(self, result: Result) -> bool:
+        return self._generations[result.source] - result.generation > self.evict_after
+
+    def commit(self, source: str = None) -> ResultsSnapshot:
+        """Publishes all pending results, pass source once it completed a pass
+
+        Without changes the snapshot is kept, so caches of its exposition stay valid. Results can only
+        become stale when a pass completes, only then all results of that pass are checked.
+        """
+        with self._lock:
+            if source is None and not self._pending and not self._discarded:
+                return self.snapshot
+
+            if source is not None:
+                self._generations[source] += 1
+
+            pending, self._pending = self._pending, {}
+            self._pending_by_labels.clear()
+            discarded, self._discarded = self._discarded, set()
+
+            # copying the proxied dict directly is much faster than building a new one from the proxy
+            results = self.snapshot.results.copy()
+
+            # pending results of discarded labels have been set after the discard, they replace the evicted ones
+            for labels in discarded:
+                for key in self._series_by_labels.pop(labels, ()):
+                    del results[key]
+                    self._evicted['dropped'] += 1
+
+            results.update(pending)
+            for key in pending:
+                self._series_by_labels[key[1]].add(key)
+
+            stale_candidates = [] if source is None else [
+                (key, result) for key, result in results.items() if result.source == source
+            ]
+            for key, result in stale_candidates:
+                if self.is_stale(result):
+                    del results[key]
+                    self._series_by_labels[key[1]].discard(key)
+                    if not self._series_by_labels[key[1]]:
+                        del self._series_by_labels[key[1]]
+                    self._evicted['stale'] += 1
+
+            documentation = dict(self._documentation)
+
+            self.snapshot = ResultsSnapshot(
+                generation=self.snapshot.generation + 1,
+                created=time.time(),
+                documentation=types.MappingProxyType(documentation),
+                results=types.MappingProxyType(results),
+                evicted=types.MappingProxyType(dict(self._evicted)),
+            )
+
+            return self.snapshot
@@ -0,0 +1,133 @@
+import collections
+import heapq
+import itertools
+import random
+import threading
+import typing
+
+from aws_quota.instrumentation import DURATION_BUCKETS, Histogram
+
+
+def jitter(interval: float) -> float:
+    """Random offset within interval, spreads work that would otherwise start at the same instant"""
+    return random.uniform(0, interval)
+
+
+def next_deadline(deadline: float, started: float, interval: float) -> float:
+    """Deadline of the cycle after the one that was due at deadline and started at started
+
+    Cycles are due interval seconds after the deadline of the previous one, not after it finished,
+    so the period doesn't drift with the duration of a cycle. A late cycle moves the schedule
+    instead of being followed by a burst of cycles that catch up. A cycle overran if it ended
+    after the deadline of the next one.
+    """
+    return max(deadline, started) + interval
+
+
+class CycleStats:
+    """Lag and overruns of the periodic cycles of each job
+
+    The lag of a cycle is how long after its deadline it started, an overrun is a cycle that took
+    longer than its interval.
+    """
+
+    def __init__(self) -> None:
+        self.cycles: typing.Dict[str, int] = collections.Counter()
+        self.overruns: typing.Dict[str, int] = collections.Counter()
+        self.lag: typing.Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def started(self, job: str, lag: float):
+        with self._lock:
+            if job not in self.lag:
+                self.lag[job] = Histogram(DURATION_BUCKETS)
+
+            self.cycles[job] += 1
+            self.lag[job].observe(max(0.0, lag))
+
+    def overrun(self, job: str):
+        with self._lock:
+            self.overruns[job] += 1
+
+    def samples(self) -> typing.List[typing.Tuple[str, int, int, Histogram]]:
+        with self._lock:
+            return [
+                (job, self.cycles[job], self.overruns[job], histogram.copy())
+                for job, histogram in self.lag.items()
+            ]
+
+
+class RefreshScheduler:
+    """Priority queue of refresh units ordered by the time they are due
+
+    The interval until a unit is due again depends on its utilization: units at or above
+    utilization_threshold are refreshed every min_interval, the interval grows linearly up to
+    max_interval for units that don't use their quota at all. Units with an unknown utilization,
+    e.g. because their limit hasn't been fetched yet, are refreshed every default_interval.
+    """
+
+    def __init__(self,
+                 min_interval: float,
+                 max_interval: float,
+                 default_interval: float,
+                 utilization_threshold: float) -> None:
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.default_interval = min(max(default_interval, self.min_interval), self.max_interval)
+        self.utilization_threshold = utilization_threshold
+
+        self._queue: typing.List[typing.Tuple[float, int, typing.Hashable]] = []
+        # due time of the latest queue entry of each unit, older entries are skipped when popped
+        self._due: typing.Dict[typing.Hashable, float] = {}
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, unit: typing.Hashable) -> bool:
+        return unit in self._due
+
+    def units(self) -> typing.KeysView:
+        return self._due.keys()
+
+    def due(self, unit: typing.Hashable) -> typing.Optional[float]:
+        """Time unit is due at, None while it is being refreshed or if it isn't scheduled"""
+        return self._due.get(unit)
+
+    def interval(self, utilization: typing.Optional[float]) -> float:
+        if utilization is None:
+            return self.default_interval
+
+        closeness = min(1.0, max(0.0, utilization / self.utilization_threshold)) if self.utilization_threshold > 0 else 1.0
+        return self.max_interval - (self.max_interval - self.min_interval) * closeness
+
+    def schedule(self, unit: typing.Hashable, due: float):
+        self._due[unit] = due
+        heapq.heappush(self._queue, (due, next(self._sequence), unit))
+
+    def unschedule(self, unit: typing.Hashable):
+        self._due.pop(unit, None)
+
+    def next_due(self) -> typing.Optional[float]:
+        self._skip_outdated()
+        return self._queue[0][0] if self._queue else None
+
+    def pop_due(self, now: float) -> typing.List[typing.Tuple[typing.Hashable, float]]:
+        """Removes and returns all units that are due with their due time, they have to be scheduled again once refreshed"""
+        units = []
+
+        self._skip_outdated()
+        while self._queue and self._queue[0][0] <= now:
+            due, _, unit = heapq.heappop(self._queue)
+            del self._due[unit]
+            units.append((unit, due))
+            self._skip_outdated()
+
+        return units
+
+    def _skip_outdated(self):
+        while self._queue:
+            due, _, unit = self._queue[0]
+            if self._due.get(unit) == due:
+                return
+            heapq.heappop(self._queue)
@@ -0,0 +1,49 @@
+import dataclasses
+import threading
+import time
+import typing
+
+from aws_quota.utils import short_exception
+
+
+@dataclasses.dataclass
+class RefreshStatus:
+    last_attempt: float = None
+    last_success: float = None
+    last_duration: float = None
+    consecutive_failures: int = 0
+    last_error: str = None
+
+
+class CheckStatuses:
+    """Outcome of the latest refreshes of each check per phase, kept for the status endpoints"""
+
+    def __init__(self) -> None:
+        self._statuses: typing.Dict[typing.Hashable, typing.Dict[str, RefreshStatus]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, check: typing.Hashable, phase: str, duration: float, error: Exception = None):
+        with self._lock:
+            status = self._statuses.setdefault(check, {}).setdefault(phase, RefreshStatus())
+            status.last_attempt = time.time()
+            status.last_duration = duration
+
+            if error is None:
+                status.last_success = status.last_attempt
+                status.consecutive_failures = 0
+                status.last_error = None
+            else:
+                status.consecutive_failures += 1
+                status.last_error = short_exception(error)
+
+    def get(self, check: typing.Hashable, phase: str) -> typing.Optional[RefreshStatus]:
+        with self._lock:
+            status = self._statuses.get(check, {}).get(phase)
+            return dataclasses.replace(status) if status is not None else None
+
+    def attempted(self, check: typing.Hashable, phase: str) -> bool:
+        return phase in self._statuses.get(check, {})
+
+    def drop(self, check: typing.Hashable):
+        with self._lock:
+            self._statuses.pop(check, None)
@@ -1,11 +1,90 @@
+import concurrent.futures
+import contextvars
 import functools
+import threading
+import weakref
+import typing
 import boto3
+import botocore.client
+import botocore.session
 import traceback
+from botocore import xform_name
+from botocore.config import Config
+
+# threads a single check uses to fetch details of many resources concurrently
+FAN_OUT_WORKERS = 4
+
+# botocore's default, raised to the number of exporter worker threads plus one fan out by configure_client_pool
+MAX_POOL_CONNECTIONS = 10
+
+__clients = weakref.WeakKeyDictionary()
+__clients_lock = threading.Lock()
+__session_locks = weakref.WeakKeyDictionary()
+
+__account_ids = weakref.WeakKeyDictionary()
+__account_ids_lock = threading.Lock()
+
+# only used to look up service and paginator models
+__botocore_session = botocore.session.get_session()
+
+
+def configure_client_pool(max_pool_connections: int):
+    global MAX_POOL_CONNECTIONS
+    MAX_POOL_CONNECTIONS = max(MAX_POOL_CONNECTIONS, max_pool_connections + FAN_OUT_WORKERS)
 
 
 @functools.lru_cache()
+def retry_config(max_attempts: int, mode: str = 'standard') -> Config:
+    """Returns the same Config object for the same retry settings, so clients using it can be shared"""
+    return Config(retries={'max_attempts': max_attempts, 'mode': mode})
+
+
+def session_lock(session: boto3.Session) -> threading.Lock:
+    """Lock that serializes everything creating clients from session, boto3 sessions aren't thread safe"""
+    with __clients_lock:
+        return __session_locks.setdefault(session, threading.Lock())
+
+
+def get_client(session: boto3.Session, service: str, region_name: str = None, config: Config = None) -> botocore.client.BaseClient:
+    """
+    Returns a client that is shared by everyone asking for the same (session, service, region, config).
+    Clients are thread safe but boto3 sessions are not, so creation is serialized per session.
+    Pass config objects that are reused, e.g. from retry_config, otherwise every call creates a new client.
+    """
+    key = (service, region_name, config)
+
+    with __clients_lock:
+        clients = __clients.setdefault(session, {})
+        if key in clients:
+            return clients[key]
+
+    with session_lock(session):
+        if key not in clients:
+            pool_config = Config(max_pool_connections=MAX_POOL_CONNECTIONS)
+            clients[key] = session.client(
+                service,
+                region_name=region_name,
+                config=pool_config.merge(config) if config is not None else pool_config
+            )
+
+        return clients[key]
+
+
 def get_account_id(session: boto3.Session) -> str:
-    return session.client('sts').get_caller_identity()['Account']
+    with __account_ids_lock:
+        if session in __account_ids:
+            return __account_ids[session]
+
+    account_id = get_client(session, 'sts').get_caller_identity()['Account']
+
+    with __account_ids_lock:
+        return __account_ids.setdefault(session, account_id)
+
+
+def set_account_id(session: boto3.Session, account_id: str):
+    """Remember the account of a session whose account is already known, e.g. one that assumes a role"""
+    with __account_ids_lock:
+        __account_ids[session] = account_id
 
 def short_exception(exception: Exception) -> str:
     """
@@ -16,9 +95,82 @@ def short_exception(exception: Exception) -> str:
     return ''.join(traceback.format_exception_only(type(exception), exception)).rstrip()
 
 
-def get_paginated_results(session: boto3.Session, service: str, method: str, key: str, paginate_args: dict = {}) -> int:
-    paginator = session.client(service).get_paginator(method)
+# page size limits that are documented, but missing from the botocore service models
+KNOWN_MAX_PAGE_SIZES = {
+    ('autoscaling', 'describe_auto_scaling_groups'): 100,
+    ('autoscaling', 'describe_launch_configurations'): 100,
+    ('ec2', 'describe_images'): 1000,
+    ('ec2', 'describe_snapshots'): 1000,
+    ('ec2', 'describe_vpc_endpoints'): 1000,
+    ('ecs', 'list_clusters'): 100,
+    ('rds', 'describe_db_instances'): 100,
+    ('rds', 'describe_db_parameter_groups'): 100,
+    ('rds', 'describe_db_cluster_parameter_groups'): 100,
+    ('rds', 'describe_event_subscriptions'): 100,
+    ('rds', 'describe_db_snapshots'): 100,
+    ('rds', 'describe_db_cluster_snapshots'): 100,
+    ('route53', 'list_hosted_zones'): 100,
+}
+
+
+@functools.lru_cache()
+def get_max_page_size(service: str, method: str) -> typing.Optional[int]:
+    """Largest page size a paginated operation accepts, None if it can't be determined"""
+    if (service, method) in KNOWN_MAX_PAGE_SIZES:
+        return KNOWN_MAX_PAGE_SIZES[(service, method)]
+
+    service_model = __botocore_session.get_service_model(service)
+    operation_name = next(name for name in service_model.operation_names if xform_name(name) == method)
+    limit_key = __botocore_session.get_paginator_model(service).get_paginator(operation_name).get('limit_key')
+    input_shape = service_model.operation_model(operation_name).input_shape
+    if limit_key is None or input_shape is None or limit_key not in input_shape.members:
+        return None
+
+    return input_shape.members[limit_key].metadata.get('max')
+
+
+def paginate(session: boto3.Session, service: str, method: str, paginate_args: dict = {}) -> typing.Iterator[dict]:
+    """Iterates the pages of method, requesting the largest page size the operation allows"""
+    client = get_client(session, service)
+    page_size = get_max_page_size(service, method)
+    pagination_config = {'PageSize': page_size} if page_size else {}
+
+    return client.get_paginator(method).paginate(**paginate_args, PaginationConfig=pagination_config)
+
+
+def get_paginated_results(session: boto3.Session, service: str, method: str, key: str, paginate_args: dict = {}) -> typing.List[dict]:
     res = []
-    for page in paginator.paginate(**paginate_args):
+    for page in paginate(session, service, method, paginate_args):
         res.extend(page[key])
-    return res
\ No newline at end of file
+    return res
+
+
+def count_paginated_results(session: boto3.Session,
+                            service: str,
+                            method: str,
+                            key: str,
+                            paginate_args: dict = {},
+                            predicate: typing.Callable[[dict], bool] = None) -> int:
+    """
+    Counts the items of all pages, or only the ones predicate matches.
+    Only the running count is kept, every page is released as soon as it has been counted.
+    """
+    count = 0
+    for page in paginate(session, service, method, paginate_args):
+        if predicate is None:
+            count += len(page[key])
+        else:
+            count += sum(1 for item in page[key] if predicate(item))
+    return count
+
+
+def map_concurrently(fn: typing.Callable, items: typing.Iterable, max_workers: int = FAN_OUT_WORKERS) -> typing.List:
+    """Calls fn for every item on a short lived thread pool and returns the results in the order of items
+
+    Requests still go through the rate limiter of their session, so the fan out can't exceed the allowed rate.
+    Every item runs in a copy of the caller's context, so its API calls count towards the calling check.
+    """
+    items = list(items)
+    contexts = [contextvars.copy_context() for _ in items]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='aws-quota-fan-out') as pool:
+        return list(pool.map(lambda context, item: context.run(fn, item), contexts, items))
@@ -0,0 +1,243 @@
+import asyncio
+import dataclasses
+import logging
+import multiprocessing
+import threading
+import time
+import typing
+
+import boto3
+import prometheus_client as prom
+from prometheus_client.core import GaugeMetricFamily, Metric
+from prometheus_client.registry import Collector
+
+from aws_quota.exposition import ExpositionCache, Response, json_response, start_http_server, text_response
+from aws_quota.prometheus import PrometheusExporter, PrometheusExporterSettings
+
+logger = logging.getLogger(__name__)
+
+# interval in seconds at which workers send their metrics to the parent process
+PUBLISH_INTERVAL = 15
+# interval in seconds at which the parent process restarts workers that died
+SUPERVISE_INTERVAL = 10
+
+
+@dataclasses.dataclass
+class WorkerConfig:
+    """Everything a worker process needs to run an exporter for its share of the accounts"""
+    index: int
+    accounts: typing.List[str]
+    regions: typing.List[str]
+    profile: str
+    role_name: str
+    role_session_name: str
+    external_id: str
+    check_keys: typing.List[str]
+    limit_overrides: typing.Dict[str, int]
+    default_rate_limit: float
+    rate_limits: typing.Dict[str, float]
+    quota_table_refresh_interval: int
+    settings: PrometheusExporterSettings
+    debug: bool = False
+
+
+def shard_accounts(accounts: typing.List[str], workers: int) -> typing.List[typing.List[str]]:
+    """Distributes accounts round robin, never creates empty shards"""
+    workers = max(1, min(workers, len(accounts)))
+    return [accounts[index::workers] for index in range(workers)]
+
+
+def run_worker(config: WorkerConfig, results: multiprocessing.Queue):
+    """Entrypoint of a worker process, runs all checks of its accounts and regularly publishes the metrics"""
+    # worker processes are spawned, so everything configured by the CLI has to be set up again
+    from aws_quota.check import ALL_CHECKS
+    from aws_quota.check.quota_check import SERVICE_QUOTA_TABLES
+    from aws_quota.cli import configure_logging, set_quota_limit_overrides
+    from aws_quota.organization import create_account_sessions
+    from aws_quota.ratelimit import RateLimiter
+    from aws_quota.utils import configure_client_pool
+
+    configure_logging(config.debug)
+    set_quota_limit_overrides(config.limit_overrides)
+    SERVICE_QUOTA_TABLES.refresh_interval = config.quota_table_refresh_interval
+    configure_client_pool(config.settings.max_workers)
+
+    source_session = boto3.Session(profile_name=config.profile)
+    rate_limiter = RateLimiter(config.default_rate_limit, config.rate_limits)
+
+    sessions = []
+    for account in config.accounts:
+        account_sessions = create_account_sessions(
+            source_session, account, config.role_name, config.regions, config.role_session_name, config.external_id)
+        for session in account_sessions:
+            rate_limiter.install(session)
+        sessions.extend(account_sessions)
+
+    check_classes = [chk for chk in ALL_CHECKS if chk.key in config.check_keys]
+    logger.info('worker %d checks %d accounts', config.index, len(config.accounts))
+
+    exporter = PrometheusExporter(sessions, check_classes, config.settings, rate_limiter)
+
+    async def publish_job():
+        while True:
+            await asyncio.sleep(PUBLISH_INTERVAL)
+            results.put((config.index, list(exporter.registry.collect()), exporter.is_ready()))
+
+    exporter.run(publish_job)
+
+
+class WorkerPool(Collector):
+    """Runs worker processes for shards of accounts and exposes their merged metrics
+
+    Samples of each worker get a worker label, so metrics that every worker exposes,
+    e.g. the check count, don't collide.
+    """
+
+    def __init__(self, namespace: str, configs: typing.List[WorkerConfig]) -> None:
+        self.namespace = namespace
+        self.configs = configs
+
+        self._context = multiprocessing.get_context('spawn')
+        self._results = self._context.Queue()
+        self._processes: typing.Dict[int, multiprocessing.Process] = {}
+        self._metrics: typing.Dict[int, typing.List[Metric]] = {}
+        self._published_at: typing.Dict[int, float] = {}
+        self._ready: typing.Dict[int, bool] = {}
+        # incremented with every publication, so the exposition is only encoded again after one
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def start_worker(self, config: WorkerConfig):
+        process = self._context.Process(
+            target=run_worker, args=(config, self._results), name=f'aws-quota-worker-{config.index}', daemon=True)
+        process.start()
+        self._processes[config.index] = process
+
+    def receive(self):
+        while True:
+            try:
+                index, metrics, ready = self._results.get()
+            except (EOFError, OSError):
+                return
+
+            with self._lock:
+                self._metrics[index] = metrics
+                self._published_at[index] = time.time()
+                self._ready[index] = ready
+                self._version += 1
+
+    def supervise(self):
+        while True:
+            time.sleep(SUPERVISE_INTERVAL)
+
+            for config in self.configs:
+                process = self._processes[config.index]
+                if process.is_alive():
+                    continue
+
+                logger.error('worker %d exited with code %s, restarting it...', config.index, process.exitcode)
+                with self._lock:
+                    self._metrics.pop(config.index, None)
+                    self._ready.pop(config.index, None)
+                self.start_worker(config)
+
+    def run(self):
+        for config in self.configs:
+            self.start_worker(config)
+
+        threading.Thread(target=self.receive, name='aws-quota-worker-results', daemon=True).start()
+
+        try:
+            self.supervise()
+        except KeyboardInterrupt:
+            logger.info('shutting down...')
+        finally:
+            for process in self._processes.values():
+                process.terminate()
+
+    def collect(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+            published_at = dict(self._published_at)
+
+        up = GaugeMetricFamily(
+            f'{self.namespace}_worker_up',
+            'Whether the worker process is running', labels=['worker'])
+        accounts = GaugeMetricFamily(
+            f'{self.namespace}_worker_accounts',
+            'Number of accounts checked by the worker process', labels=['worker'])
+        last_publish = GaugeMetricFamily(
+            f'{self.namespace}_worker_last_publish_timestamp_seconds',
+            'Time the worker process last published its metrics', labels=['worker'])
+
+        for config in self.configs:
+            labels = [str(config.index)]
+            up.add_metric(labels, 1 if self.is_alive(config.index) else 0)
+            accounts.add_metric(labels, len(config.accounts))
+            if config.index in published_at:
+                last_publish.add_metric(labels, published_at[config.index])
+
+        yield from (up, accounts, last_publish)
+
+        merged: typing.Dict[str, Metric] = {}
+        for index, families in sorted(metrics.items()):
+            for family in families:
+                if family.name not in merged:
+                    merged[family.name] = Metric(family.name, family.documentation, family.type, family.unit)
+
+                merged[family.name].samples.extend(
+                    sample._replace(labels={**sample.labels, 'worker': str(index)}) for sample in family.samples
+                )
+
+        yield from merged.values()
+
+    def is_alive(self, index: int) -> bool:
+        process = self._processes.get(index)
+        return process is not None and process.is_alive()
+
+    def healthz(self, headers) -> Response:
+        # dead workers are restarted by the supervisor, the pool itself is healthy as long as it serves
+        return text_response(200, 'ok')
+
+    def readyz(self, headers) -> Response:
+        with self._lock:
+            ready = all(self._ready.get(config.index, False) for config in self.configs)
+
+        if ready:
+            return text_response(200, 'ready')
+
+        return text_response(503, 'not all workers have refreshed their checks yet')
+
+    def status(self) -> dict:
+        with self._lock:
+            published_at = dict(self._published_at)
+            ready = dict(self._ready)
+
+        return {
+            'workers': [
+                {
+                    'worker': config.index,
+                    'up': self.is_alive(config.index),
+                    'ready': ready.get(config.index, False),
+                    'accounts': config.accounts,
+                    'last_publish': published_at.get(config.index),
+                }
+                for config in self.configs
+            ]
+        }
+
+    def start(self, port: int):
+        registry = prom.CollectorRegistry(auto_describe=False)
+        registry.register(self)
+
+        exposition = ExpositionCache(registry, lambda: self._version)
+
+        logger.info(f'starting /metrics endpoint on port {port}')
+        start_http_server(port, {
+            '/': exposition.response,
+            '/metrics': exposition.response,
+            '/healthz': self.healthz,
+            '/readyz': self.readyz,
+            '/api/status': lambda headers: json_response(self.status()),
+        })
+        self.run()
@@ -72,19 +72,30 @@ Rule template for request duration
 {{- $querySuffix := .QuerySuffix -}}
 {{- $verbPhrase := .VerbPhrase -}}
 {{- $alertName := .AlertName -}}
+{{- $phase := .Phase -}}
 {{ $ := .Context }}
 {{- if $alertValues.enabled }}
         - alert: AWSQuota {{- $alertName }}
           expr: >-
+            {{- if $phase }}
+            sum by (quota) (
+                rate(awsquota_check_duration_seconds_sum{phase="{{ $phase }}", job="{{ include "aws-quota-checker.fullname" $ }}", namespace="{{ $.Release.Namespace }}"}[{{ $alertValues.duration }}])
+            )
+            /
+            sum by (quota) (
+                rate(awsquota_check_duration_seconds_count{phase="{{ $phase }}", job="{{ include "aws-quota-checker.fullname" $ }}", namespace="{{ $.Release.Namespace }}"}[{{ $alertValues.duration }}])
+            ) > {{ $alertValues.thresholdSeconds }}
+            {{- else }}
             avg_over_time(
                 avg by (quota, account, region) (
                     {
                       __name__=~"awsquota_.*_{{ $querySuffix }}",
-                      job=~"{{ printf "%s-.*" (include "aws-quota-checker.fullname" $) }}",
+                      job="{{ include "aws-quota-checker.fullname" $ }}",
                       namespace="{{ $.Release.Namespace }}"
                     }
                 )[{{ $alertValues.duration }}:]
             ) > {{ $alertValues.thresholdSeconds }}
+            {{- end }}
           for: {{ $alertValues.duration }}
           annotations:
             description: >-
@@ -0,0 +1,65 @@
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from aws_quota.check.quota_check import (
+    SERVICE_QUOTA_TABLES,
+    QuotaCheck,
+    QuotaScope,
+    get_default_service_quota,
+    get_service_quota,
+)
+from aws_quota.utils import set_account_id
+
+
+class ExampleCheck(QuotaCheck):
+    key = 'example_count'
+    scope = QuotaScope.REGION
+    service_code = 'ec2'
+    quota_code = 'L-12345678'
+
+
+@pytest.fixture(autouse=True)
+def clear_quota_caches():
+    SERVICE_QUOTA_TABLES._tables.clear()
+    get_service_quota.cache_clear()
+    get_default_service_quota.cache_clear()
+    yield
+
+
+def create_session(account: str, region: str) -> boto3.Session:
+    session = boto3.Session(region_name=region, aws_access_key_id='test', aws_secret_access_key='test')
+    set_account_id(session, account)
+    return session
+
+
+def test_per_quota_fallback_keeps_accounts_and_regions_apart():
+    limits = {
+        ('111111111111', 'us-east-1'): 10,
+        ('111111111111', 'eu-west-1'): 20,
+        ('222222222222', 'us-east-1'): 30,
+        ('222222222222', 'eu-west-1'): 40,
+    }
+
+    checks = []
+    stubbers = []
+    for (account, region), limit in limits.items():
+        check = ExampleCheck(create_session(account, region))
+        stubber = Stubber(check.sq_client)
+        # the role isn't allowed to list quotas, so every check falls back to GetServiceQuota
+        stubber.add_client_error('list_aws_default_service_quotas', 'AccessDeniedException')
+        stubber.add_response(
+            'get_service_quota',
+            {'Quota': {'Value': float(limit)}},
+            {'ServiceCode': ExampleCheck.service_code, 'QuotaCode': ExampleCheck.quota_code},
+        )
+        stubber.activate()
+        checks.append(check)
+        stubbers.append(stubber)
+
+    assert [check.maximum for check in checks] == list(limits.values())
+    # cached per account and region, a second lookup doesn't call the API again
+    assert [check.maximum for check in checks] == list(limits.values())
+
+    for stubber in stubbers:
+        stubber.assert_no_pending_responses()